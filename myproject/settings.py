@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -83,9 +84,50 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Connexions conservées entre requêtes (secondes), vérifiées avant réutilisation
+        "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": os.environ.get("DATABASE_CONN_HEALTH_CHECKS", "true").lower() == "true",
     }
 }
 
+# PRAGMA appliqués à chaque connexion SQLite (voir products.database). Le mode WAL
+# (lectures pendant une écriture) est activé une fois par migrate (0010_sqlite_wal) ;
+# avec WAL, NORMAL ne synchronise le disque qu'aux checkpoints
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+
+# Attente (ms) d'un verrou tenu par un autre écrivain avant "database is locked"
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))
+
+# Taille (octets) du fichier lue par mmap, et cache de pages (négatif : en Kio)
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64000))
+
+
+# Cache (mémoire locale par défaut ; un backend partagé, ex. Redis, est nécessaire
+# pour que les invalidations faites par les workers consumer atteignent les processus web,
+# comme dès que plusieurs processus web servent : gunicorn -w N, chacun son cache)
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "products.cache.CountingLocMemCache")
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.environ.get("CACHE_LOCATION", "product-service"),
+    }
+}
+
+if CACHE_BACKEND == "products.cache.CountingLocMemCache":
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 10000))}
+
+PRODUCT_CACHE_ALIAS = "default"
+
+# Durée de vie (secondes) du détail et du stock d'un produit en cache
+PRODUCT_CACHE_TIMEOUT = int(os.environ.get("PRODUCT_CACHE_TIMEOUT", 60))
+
+# Durée de vie (secondes) des réponses de liste rendues, indexées par version du catalogue
+PRODUCT_RESPONSE_CACHE_TIMEOUT = int(os.environ.get("PRODUCT_RESPONSE_CACHE_TIMEOUT", 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -127,3 +169,91 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# RabbitMQ
+
+RABBITMQ_HOST = os.environ.get("RABBITMQ_HOST", "rabbitmq")
+
+RABBITMQ_EXCHANGE = "service_exchange"
+
+# Attend l'accusé de réception du broker pour chaque message publié
+RABBITMQ_PUBLISHER_CONFIRMS = os.environ.get("RABBITMQ_PUBLISHER_CONFIRMS", "false").lower() == "true"
+
+
+# Démarre un thread consumer dans chaque processus web (pratique en développement).
+# À désactiver en production au profit de "manage.py consume_events --workers N".
+EVENT_CONSUMER_IN_WEB_PROCESS = os.environ.get("EVENT_CONSUMER_IN_WEB_PROCESS", "true").lower() == "true"
+
+EVENT_CONSUMER_WORKERS = int(os.environ.get("EVENT_CONSUMER_WORKERS", 1))
+
+# Port HTTP du /metrics de chaque consumer lancé à part (worker i : port + i ; 0 : désactivé)
+EVENT_CONSUMER_METRICS_PORT = int(os.environ.get("EVENT_CONSUMER_METRICS_PORT", 0))
+
+# Nombre de messages non acquittés que le broker peut livrer d'avance à chaque queue
+RABBITMQ_PREFETCH_COUNT = int(os.environ.get("RABBITMQ_PREFETCH_COUNT", 200))
+
+# Un lot consommé est traité dès qu'il atteint cette taille...
+EVENT_CONSUMER_BATCH_SIZE = int(os.environ.get("EVENT_CONSUMER_BATCH_SIZE", 100))
+
+# ...ou que son premier message attend depuis ce délai (secondes)
+EVENT_CONSUMER_BATCH_WINDOW = float(os.environ.get("EVENT_CONSUMER_BATCH_WINDOW", 0.2))
+
+# Mesure en arrière-plan de la profondeur des queues consommées (processus web)
+RABBITMQ_QUEUE_SAMPLER_ENABLED = os.environ.get("RABBITMQ_QUEUE_SAMPLER_ENABLED", "true").lower() == "true"
+
+RABBITMQ_QUEUE_SAMPLE_INTERVAL = float(os.environ.get("RABBITMQ_QUEUE_SAMPLE_INTERVAL", 15))
+
+
+# Nombre d'identifiants de messages (et de versions de produits) gardés en mémoire pour la déduplication
+EVENT_DEDUP_CACHE_SIZE = int(os.environ.get("EVENT_DEDUP_CACHE_SIZE", 100000))
+
+# Enregistre aussi les messages traités en base (table ProcessedEvent)
+EVENT_DEDUP_PERSIST = os.environ.get("EVENT_DEDUP_PERSIST", "false").lower() == "true"
+
+# Conservation (secondes) des ProcessedEvent : un message redélivré plus tard n'est plus reconnu
+EVENT_DEDUP_RETENTION = int(os.environ.get("EVENT_DEDUP_RETENTION", 7 * 24 * 3600))
+
+
+# Publication des événements
+
+# Transport des événements publiés et consommés :
+# "amqp" : RabbitMQ (RABBITMQ_HOST)
+# "inprocess" : file en mémoire livrée aux handlers du même processus, sans broker
+# (nœud unique, benchmarks ; le consumer tourne alors dans le processus web)
+EVENT_TRANSPORT = os.environ.get("EVENT_TRANSPORT", "amqp")
+
+# "background" : les vues déposent les événements dans une file vidée par un thread
+# "sync" : publication directe dans la requête
+# (dans ces deux modes, l'événement ne part qu'après le commit de la transaction)
+# "outbox" : écriture dans la table outbox, dans la transaction du produit (voir relay_outbox)
+EVENT_DISPATCH_MODE = os.environ.get("EVENT_DISPATCH_MODE", "background")
+
+EVENT_QUEUE_MAXSIZE = int(os.environ.get("EVENT_QUEUE_MAXSIZE", 10000))
+
+EVENT_DISPATCH_BATCH_SIZE = int(os.environ.get("EVENT_DISPATCH_BATCH_SIZE", 100))
+
+# Politique quand la file est pleine : "block", "drop_oldest" ou "spill"
+EVENT_QUEUE_OVERFLOW = os.environ.get("EVENT_QUEUE_OVERFLOW", "spill")
+
+EVENT_QUEUE_BLOCK_TIMEOUT = float(os.environ.get("EVENT_QUEUE_BLOCK_TIMEOUT", 1.0))
+
+EVENT_SPILL_PATH = os.environ.get("EVENT_SPILL_PATH", str(BASE_DIR / "event_spill.ndjson"))
+
+# Nombre maximum de produits par message pour les événements groupés
+EVENT_BATCH_CHUNK_SIZE = int(os.environ.get("EVENT_BATCH_CHUNK_SIZE", 500))
+
+OUTBOX_RELAY_BATCH_SIZE = int(os.environ.get("OUTBOX_RELAY_BATCH_SIZE", 500))
+
+
+# Pagination de la liste des produits (activée par ?page_size= ou ?cursor=)
+
+PRODUCT_PAGE_SIZE = int(os.environ.get("PRODUCT_PAGE_SIZE", 100))
+
+PRODUCT_MAX_PAGE_SIZE = int(os.environ.get("PRODUCT_MAX_PAGE_SIZE", 1000))
+
+# Nombre de lignes lues par requête SQL (et par bloc émis) pendant l'export du catalogue
+PRODUCT_EXPORT_CHUNK_SIZE = int(os.environ.get("PRODUCT_EXPORT_CHUNK_SIZE", 2000))
+
+# Nombre maximum de produits acceptés par /api/products/bulk/
+PRODUCT_BULK_MAX_ITEMS = int(os.environ.get("PRODUCT_BULK_MAX_ITEMS", 5000))
@@ -6,8 +6,45 @@ class ProductsConfig(AppConfig):
     name = 'products'
 
     def ready(self):
-        """Démarre le consumer RabbitMQ quand l'app est prête"""
+        """Règle les connexions SQLite et les triggers FTS5, puis démarre le consumer RabbitMQ et le queue sampler"""
         import os
-        if os.environ.get('RUN_MAIN', None) != 'true':
+        import sys
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+        from .database import configure_sqlite
+        from .search import restore_fts_triggers
+
+        # Avant tout retour anticipé : les commandes (migrate, consumers...) écrivent aussi en base
+        connection_created.connect(configure_sqlite, dispatch_uid='products.configure_sqlite')
+        post_migrate.connect(restore_fts_triggers, sender=self, dispatch_uid='products.restore_fts_triggers')
+
+        # Ni migrate, ni test, ni les autres commandes n'ont besoin des threads d'arrière-plan
+        if os.path.basename(sys.argv[0]) == 'manage.py' and sys.argv[1:2] != ['runserver']:
+            return
+
+        from .transport import TRANSPORT_INPROCESS
+        # Sous l'autoreloader de runserver, le parent surveille les fichiers et
+        # l'enfant (RUN_MAIN=true) sert les requêtes
+        reloader_child = os.environ.get('RUN_MAIN', None) == 'true'
+        reloader_parent = sys.argv[1:2] == ['runserver'] and '--noreload' not in sys.argv and not reloader_child
+
+        if settings.EVENT_TRANSPORT == TRANSPORT_INPROCESS:
+            # Le transport en mémoire n'est livré qu'aux handlers du processus qui publie :
+            # le consumer tourne donc là où les requêtes sont servies
+            if not reloader_parent:
+                from .service_product import start_consumer_thread
+                start_consumer_thread()
+            return
+
+        # Le sampler et le consumer alimentent le cache et le registre Prometheus du processus :
+        # ils tournent là où les requêtes (et /metrics) sont servies
+        if reloader_parent:
+            return
+        if settings.RABBITMQ_QUEUE_SAMPLER_ENABLED:
+            from .queue_sampler import start_queue_sampler
+            start_queue_sampler()
+        # En production les consumers tournent à part : manage.py consume_events --workers N
+        if settings.EVENT_CONSUMER_IN_WEB_PROCESS:
             from .service_product import start_consumer_thread
             start_consumer_thread()
@@ -0,0 +1,265 @@
+import json
+import math
+import platform
+import random
+import time
+from collections import deque
+from unittest.mock import patch
+
+import django
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .consumer import QueueBuffer
+from .models import Product
+from .publisher import RabbitMQPublisher, reset_publisher
+from .service_product import handle_stock_updated_batch
+from .transport import InProcessTransport
+
+
+class FakeChannel:
+    """Channel pika simulé : les messages publiés restent en mémoire"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+
+    def exchange_declare(self, **kwargs):
+        pass
+
+    def confirm_delivery(self):
+        pass
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.broker.messages.append((routing_key, body))
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.broker.acked = delivery_tag
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        pass
+
+
+class FakeBroker:
+    """Broker simulé : fait office de ``pika.BlockingConnection`` pour le publisher"""
+
+    def __init__(self):
+        self.messages = deque()
+        self.acked = None
+        self.is_open = True
+
+    def __call__(self, parameters):
+        return self
+
+    def channel(self):
+        return FakeChannel(self)
+
+    def close(self):
+        pass
+
+
+class Delivery:
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+        self.redelivered = False
+
+
+def percentile(sorted_values, fraction):
+    """Percentile au rang le plus proche sur des valeurs triées"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed, operations=None):
+    """Débit et latences (ms) d'un scénario ; ``operations`` compte les unités traitées (messages...)"""
+    ordered = sorted(latencies)
+    operations = len(latencies) if operations is None else operations
+    return {
+        'count': operations,
+        'throughput_per_s': round(operations / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+def seed_products(count, batch_size=5000, seed=42):
+    """Crée ``count`` produits reproductibles (stock de 0 à 200)"""
+    rng = random.Random(seed)
+    for start in range(0, count, batch_size):
+        Product.objects.bulk_create([
+            Product(
+                name=f'Produit {i}',
+                description=f'Description du produit {i}',
+                price=f'{rng.randint(1, 999)}.{rng.randint(0, 99):02d}',
+                stock=rng.randint(0, 200)
+            )
+            for i in range(start, min(start + batch_size, count))
+        ])
+
+
+class BenchmarkSuite:
+    """Scénarios de performance des chemins critiques : API produits, publication et consommation.
+
+    Les requêtes passent par le client de test Django (pile WSGI complète, sans
+    réseau) sur la base courante ; les événements passent par un broker simulé en
+    mémoire. Chaque scénario est joué ``requests`` fois et ``run()`` renvoie un
+    rapport JSON-sérialisable (débit, p50/p95/p99).
+    """
+
+    def __init__(self, requests=200, seed=42, warmup=20):
+        self.requests = requests
+        self.warmup = warmup
+        self.rng = random.Random(seed)
+        self.client = Client()
+        self.product_ids = list(Product.objects.values_list('id', flat=True))
+
+    def run_http(self, build_request, cold=True):
+        # Premières requêtes non mesurées : imports paresseux, statements SQLite préparés...
+        for _ in range(self.warmup):
+            method, path, data = build_request()
+            self.request(method, path, data)
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(self.requests):
+            if cold:
+                # Mesure du chemin base + sérialisation, pas du cache de réponses
+                cache.clear()
+            method, path, data = build_request()
+            request_started = time.perf_counter()
+            self.request(method, path, data)
+            latencies.append(time.perf_counter() - request_started)
+        return summarize(latencies, time.perf_counter() - started)
+
+    def request(self, method, path, data):
+        if method == 'get':
+            response = self.client.get(path, data)
+        else:
+            response = getattr(self.client, method)(path, json.dumps(data), content_type='application/json')
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method.upper()} {path} → {response.status_code}")
+        return response
+
+    def random_id(self):
+        return self.rng.choice(self.product_ids)
+
+    def http_scenarios(self):
+        list_url = reverse('product-list-create')
+        return {
+            'list_page': lambda: ('get', list_url, {'page_size': 100}),
+            'list_filtered': lambda: ('get', list_url, {
+                'min_price': 100, 'max_price': 200, 'available': 'true', 'page_size': 100
+            }),
+            'detail': lambda: ('get', reverse('product-detail', kwargs={'pk': self.random_id()}), None),
+            'stock_read': lambda: ('get', reverse('product-stock', kwargs={'product_id': self.random_id()}), None),
+            'stock_update': lambda: (
+                'patch', reverse('update-product-stock', kwargs={'product_id': self.random_id()}),
+                {'stock': self.rng.randint(50, 200)}
+            ),
+            'stock_increment': lambda: (
+                'post', reverse('increment-product-stock', kwargs={'product_id': self.random_id()}), {'quantity': 1}
+            ),
+            'low_stock': lambda: ('get', reverse('low-stock-products'), {'threshold': 10}),
+        }
+
+    def run_publish(self, broker):
+        broker.messages.clear()
+        publisher = RabbitMQPublisher(host='bench', exchange='bench')
+        message = {'product_id': 1, 'new_stock': 1, 'timestamp': time.time()}
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(self.requests):
+            publish_started = time.perf_counter()
+            publisher.publish('stock.updated', message)
+            latencies.append(time.perf_counter() - publish_started)
+        return summarize(latencies, time.perf_counter() - started)
+
+    def run_consume(self, broker, batch_size=100):
+        """Rejoue des stock.updated publiés sur le broker simulé à travers QueueBuffer (lots, ack multiple)"""
+        broker.messages.clear()
+        publisher = RabbitMQPublisher(host='bench', exchange='bench')
+        messages = [
+            ('stock.updated', {'product_id': self.random_id(), 'new_stock': self.rng.randint(0, 200)})
+            for _ in range(self.requests * 10)
+        ]
+        publisher.publish_batch(messages)
+
+        latencies = []
+        channel = FakeChannel(broker)
+        buffer = QueueBuffer(channel, 'bench_queue', handle_stock_updated_batch, batch_size, 60, 'stock.updated')
+        started = time.perf_counter()
+        tag = 0
+        while broker.messages:
+            batch_started = time.perf_counter()
+            for _ in range(min(batch_size, len(broker.messages))):
+                tag += 1
+                _, body = broker.messages.popleft()
+                buffer.append(channel, Delivery(tag), None, body)
+            buffer.flush()
+            latencies.append(time.perf_counter() - batch_started)
+        return summarize(latencies, time.perf_counter() - started, operations=tag)
+
+    def run_inprocess(self, batch_size=100):
+        """Publication puis livraison par le transport en mémoire (sans JSON ni broker), par lots"""
+        transport = InProcessTransport(batch_size=batch_size, batch_window=0)
+        transport.bind('bench_queue', 'stock.updated', handle_stock_updated_batch)
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(self.requests * 10 // batch_size):
+            batch_started = time.perf_counter()
+            transport.publish_batch([
+                ('stock.updated', {'product_id': self.random_id(), 'new_stock': self.rng.randint(0, 200)})
+                for _ in range(batch_size)
+            ])
+            transport.drain('bench_queue', handle_stock_updated_batch)
+            latencies.append(time.perf_counter() - batch_started)
+        return summarize(latencies, time.perf_counter() - started, operations=len(latencies) * batch_size)
+
+    def run(self, scenarios=None):
+        """Joue les scénarios demandés (tous par défaut) ; les événements restent en mode synchrone"""
+        broker = FakeBroker()
+        http = self.http_scenarios()
+        runners = {name: (lambda build=build: self.run_http(build)) for name, build in http.items()}
+        runners['list_page_cached'] = lambda: self.run_http(http['list_page'], cold=False)
+        runners['publish'] = lambda: self.run_publish(broker)
+        runners['consume'] = lambda: self.run_consume(broker)
+        runners['inprocess_roundtrip'] = self.run_inprocess
+
+        results = {}
+        with override_settings(DEBUG=False, EVENT_DISPATCH_MODE='sync'), \
+                patch('products.publisher.pika.BlockingConnection', broker):
+            # Le publisher partagé (mode sync) doit se connecter au broker simulé
+            reset_publisher()
+            try:
+                for name, runner in runners.items():
+                    if scenarios is None or name in scenarios:
+                        results[name] = runner()
+            finally:
+                reset_publisher()
+        return {
+            'meta': {
+                'products': len(self.product_ids),
+                'requests': self.requests,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'machine': platform.machine(),
+            },
+            'scenarios': results,
+        }
+
+
+def compare_to_baseline(report, baseline, tolerance=0.2, metric='p95_ms'):
+    """Compare ``metric`` scénario par scénario ; renvoie {scénario: (baseline, actuel, ratio, régression)}"""
+    comparison = {}
+    for name, current in report['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if not reference or not reference.get(metric):
+            continue
+        ratio = current[metric] / reference[metric]
+        comparison[name] = (reference[metric], current[metric], round(ratio, 2), ratio > 1 + tolerance)
+    return comparison
@@ -0,0 +1,153 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import has_vary_header
+
+from .middleware import product_cache_evictions_total, product_cache_requests_total
+
+DETAIL = 'detail'
+STOCK = 'stock'
+VALIDATORS = 'validators'
+RESPONSE = 'response'
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+class CountingLocMemCache(LocMemCache):
+    """Cache mémoire local qui compte les entrées évincées faute de place"""
+
+    def _cull(self):
+        size = len(self._cache)
+        super()._cull()
+        product_cache_evictions_total.labels(reason='culled').inc(size - len(self._cache))
+
+
+def get_product_cache():
+    return caches[settings.PRODUCT_CACHE_ALIAS]
+
+
+def _key(kind, product_id):
+    return f'product:{kind}:{product_id}'
+
+
+def cached_lookup(kind, product_id, load):
+    """Lecture à travers le cache : ``load()`` n'est appelé (et son résultat stocké) qu'en cas d'absence"""
+    cache = get_product_cache()
+    key = _key(kind, product_id)
+    value = cache.get(key)
+    if value is not None:
+        product_cache_requests_total.labels(cache=kind, result='hit').inc()
+        return value
+
+    product_cache_requests_total.labels(cache=kind, result='miss').inc()
+    value = load()
+    if value is not None:
+        cache.set(key, value, settings.PRODUCT_CACHE_TIMEOUT)
+    return value
+
+
+def get_catalog_version():
+    """Version du catalogue : change à chaque écriture, préfixe les réponses de liste en cache"""
+    # Valeur initiale horodatée : si la clé est évincée, la version repart plus haut
+    # au lieu de retomber sur des réponses encore en cache
+    return get_product_cache().get_or_set(CATALOG_VERSION_KEY, lambda: time.time_ns() // 1000, None)
+
+
+def bump_catalog_version():
+    cache = get_product_cache()
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns() // 1000, None)
+
+
+def _catalog_key(kind, request):
+    # Même URL complète (les liens ``next`` sont absolus : schéma et hôte en font partie)
+    # et même Accept (le rendu en dépend)
+    variant = f"{request.build_absolute_uri()}|{request.META.get('HTTP_ACCEPT', '')}"
+    digest = hashlib.md5(variant.encode('utf-8')).hexdigest()
+    return f'catalog:{kind}:{get_catalog_version()}:{digest}'
+
+
+def cached_catalog_value(kind, request, load):
+    """Lecture à travers le cache d'une valeur dérivée du catalogue entier (ETag de liste...)"""
+    cache = get_product_cache()
+    key = _catalog_key(kind, request)
+    value = cache.get(key)
+    if value is not None:
+        product_cache_requests_total.labels(cache=kind, result='hit').inc()
+        return value
+
+    product_cache_requests_total.labels(cache=kind, result='miss').inc()
+    value = load()
+    if value is not None:
+        cache.set(key, value, settings.PRODUCT_RESPONSE_CACHE_TIMEOUT)
+    return value
+
+
+def cached_catalog_response(request):
+    """Réponse déjà rendue pour cette requête et cette version du catalogue, ou None.
+
+    À appeler avant toute lecture en base : la clé (donc la version) est retenue
+    sur la requête pour ``cache_catalog_response``.
+    """
+    request._catalog_response_key = key = _catalog_key(RESPONSE, request)
+    entry = get_product_cache().get(key)
+    if entry is None:
+        product_cache_requests_total.labels(cache=RESPONSE, result='miss').inc()
+        return None
+
+    product_cache_requests_total.labels(cache=RESPONSE, result='hit').inc()
+    content, content_type, headers = entry
+    response = HttpResponse(content, content_type=content_type)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def cache_catalog_response(request, response, headers=('Last-Modified', 'Vary')):
+    """Met le corps rendu de ``response`` en cache sous la version courante du catalogue"""
+    # Version lue avant la requête SQL : si une écriture a eu lieu entre-temps,
+    # l'entrée est rangée sous l'ancienne version et ne sera jamais servie
+    key = getattr(request, '_catalog_response_key', None) or _catalog_key(RESPONSE, request)
+
+    def store(rendered):
+        # Seul le JSON commun à tous les clients est partagé : l'API navigable (HTML)
+        # porte un jeton CSRF et varie selon le cookie de session
+        if (rendered.status_code == 200 and rendered.get('Content-Type', '').startswith('application/json')
+                and not has_vary_header(rendered, 'Cookie')):
+            kept = {header: rendered[header] for header in headers if rendered.has_header(header)}
+            get_product_cache().set(
+                key, (rendered.content, rendered['Content-Type'], kept), settings.PRODUCT_RESPONSE_CACHE_TIMEOUT
+            )
+
+    if hasattr(response, 'add_post_render_callback'):
+        response.add_post_render_callback(store)
+    else:
+        store(response)
+    return response
+
+
+def invalidate_products(product_ids):
+    """Retire du cache le détail, le stock et la version des produits modifiés.
+
+    La version du catalogue est aussi incrémentée, ce qui rend inaccessibles les
+    listes en cache. L'invalidation est faite tout de suite puis répétée au commit :
+    une lecture concurrente ne peut pas remettre en cache l'état d'avant la transaction.
+    """
+    keys = [_key(kind, product_id) for product_id in set(product_ids) for kind in (DETAIL, STOCK, VALIDATORS)]
+    if not keys:
+        return
+
+    def delete():
+        get_product_cache().delete_many(keys)
+        bump_catalog_version()
+        product_cache_evictions_total.labels(reason='invalidated').inc(len(keys))
+
+    delete()
+    transaction.on_commit(delete)
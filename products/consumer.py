@@ -0,0 +1,143 @@
+import json
+import time
+
+import pika
+from django.conf import settings
+from django.db import close_old_connections
+
+from .middleware import track_handled, track_reconnect, track_rabbitmq_message
+
+ORDER_QUEUE = 'product_service_order_queue'
+STOCK_QUEUE = 'product_service_stock_queue'
+CONSUMED_QUEUES = (ORDER_QUEUE, STOCK_QUEUE)
+
+
+def run_handler(handler, messages, queue, routing_key):
+    """Appelle ``handler(messages)`` en mesurant sa durée, l'âge des messages et ses échecs.
+
+    Les mesures vont dans le registre Prometheus du processus courant : celui du
+    processus web est servi par /metrics, celui d'un consumer lancé à part par
+    ``consume_events --metrics-port``.
+    """
+    started = time.perf_counter()
+    try:
+        handler(messages)
+    except Exception:
+        track_handled(queue, settings.RABBITMQ_EXCHANGE, routing_key, messages, time.perf_counter() - started, False)
+        raise
+    track_handled(queue, settings.RABBITMQ_EXCHANGE, routing_key, messages, time.perf_counter() - started)
+
+
+class QueueBuffer:
+    """Messages reçus sur une queue, en attente d'être traités ensemble"""
+
+    def __init__(self, channel, queue, handler, batch_size, batch_window, routing_key=''):
+        self.channel = channel
+        self.queue = queue
+        self.routing_key = routing_key
+        self.handler = handler
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.deliveries = []
+        self.first_received_at = None
+
+    def append(self, channel, method, properties, body):
+        """Callback pika : le message est mis de côté, l'ack viendra après le traitement du lot"""
+        if not self.deliveries:
+            self.first_received_at = time.monotonic()
+        self.deliveries.append((method, properties, body))
+        if len(self.deliveries) >= self.batch_size:
+            self.flush()
+
+    def is_due(self):
+        return bool(self.deliveries) and time.monotonic() - self.first_received_at >= self.batch_window
+
+    def flush(self):
+        """Traite le lot puis l'acquitte en une seule trame (ack multiple)"""
+        deliveries, self.deliveries = self.deliveries, []
+        if not deliveries:
+            return
+        # Connexion DB éventuellement expirée entre deux lots
+        close_old_connections()
+
+        messages = []
+        for method, properties, body in deliveries:
+            try:
+                messages.append(json.loads(body))
+            except ValueError as e:
+                print(f"❌ Invalid message on {self.queue}, discarded: {e}")
+                track_rabbitmq_message(self.queue, settings.RABBITMQ_EXCHANGE, self.routing_key, 'invalid')
+
+        try:
+            run_handler(self.handler, messages, self.queue, self.routing_key)
+        except Exception as e:
+            print(f"❌ Batch of {len(messages)} messages failed on {self.queue}, retrying one by one: {e}")
+            self._handle_one_by_one(deliveries)
+            return
+        self.channel.basic_ack(delivery_tag=deliveries[-1][0].delivery_tag, multiple=True)
+
+    def _handle_one_by_one(self, deliveries):
+        for method, properties, body in deliveries:
+            try:
+                run_handler(self.handler, [json.loads(body)], self.queue, self.routing_key)
+                self.channel.basic_ack(delivery_tag=method.delivery_tag)
+            except Exception as e:
+                # Un message déjà redélivré qui échoue encore est abandonné (poison message)
+                print(f"❌ Message {method.delivery_tag} failed on {self.queue}: {e}")
+                self.channel.basic_nack(delivery_tag=method.delivery_tag, requeue=not method.redelivered)
+
+
+class BatchingConsumer:
+    """Consumer RabbitMQ qui traite les messages par lots, avec ack manuel.
+
+    Chaque queue a son propre channel (les delivery tags sont propres à un channel,
+    ce qui permet d'acquitter un lot entier d'un seul ``basic_ack(multiple=True)``).
+    Un lot est traité dès qu'il atteint ``batch_size`` messages ou que son plus
+    ancien message a attendu ``batch_window`` secondes.
+    """
+
+    def __init__(self, host=None, prefetch_count=None, batch_size=None, batch_window=None):
+        self.host = host or settings.RABBITMQ_HOST
+        self.prefetch_count = prefetch_count or settings.RABBITMQ_PREFETCH_COUNT
+        self.batch_size = batch_size or settings.EVENT_CONSUMER_BATCH_SIZE
+        self.batch_window = batch_window if batch_window is not None else settings.EVENT_CONSUMER_BATCH_WINDOW
+        self.bindings = []
+
+    def bind(self, queue, routing_key, handler):
+        """Associe une queue (liée à une routing key) à un handler qui reçoit une liste de messages"""
+        self.bindings.append((queue, routing_key, handler))
+
+    def _consume(self):
+        connection = pika.BlockingConnection(pika.ConnectionParameters(self.host))
+        buffers = []
+        try:
+            for queue, routing_key, handler in self.bindings:
+                channel = connection.channel()
+                channel.exchange_declare(exchange=settings.RABBITMQ_EXCHANGE, exchange_type='topic', durable=True)
+                channel.queue_declare(queue=queue, durable=True)
+                channel.queue_bind(exchange=settings.RABBITMQ_EXCHANGE, queue=queue, routing_key=routing_key)
+                channel.basic_qos(prefetch_count=self.prefetch_count)
+
+                buffer = QueueBuffer(channel, queue, handler, self.batch_size, self.batch_window, routing_key)
+                channel.basic_consume(queue=queue, on_message_callback=buffer.append, auto_ack=False)
+                buffers.append(buffer)
+
+            print("👂 Product service écoute les événements...")
+            while True:
+                connection.process_data_events(time_limit=self.batch_window)
+                for buffer in buffers:
+                    if buffer.is_due():
+                        buffer.flush()
+        finally:
+            if connection.is_open:
+                connection.close()
+
+    def run(self):
+        """Consomme indéfiniment, en se reconnectant après une erreur"""
+        while True:
+            try:
+                self._consume()
+            except Exception as e:
+                print(f"❌ Erreur RabbitMQ (consume_events) : {e}")
+                time.sleep(5)
+                track_reconnect('consumer')
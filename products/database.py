@@ -0,0 +1,36 @@
+from django.conf import settings
+
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def _choice(name, value, choices):
+    # Les PRAGMA ne prennent pas de paramètres liés : seules les valeurs connues sont acceptées
+    value = str(value).upper()
+    if value not in choices:
+        raise ValueError(f"{name} invalide : {value} (valeurs possibles : {', '.join(choices)})")
+    return value
+
+
+def sqlite_pragmas():
+    """PRAGMA de connexion à appliquer, dans l'ordre, d'après les settings SQLITE_*"""
+    return (
+        ('synchronous', _choice('SQLITE_SYNCHRONOUS', settings.SQLITE_SYNCHRONOUS, SYNCHRONOUS_MODES)),
+        ('busy_timeout', int(settings.SQLITE_BUSY_TIMEOUT)),
+        ('mmap_size', int(settings.SQLITE_MMAP_SIZE)),
+        ('cache_size', int(settings.SQLITE_CACHE_SIZE)),
+    )
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Receiver connection_created : règle chaque nouvelle connexion SQLite.
+
+    Ces PRAGMA valent pour la connexion seulement et n'écrivent rien dans le
+    fichier ; avec CONN_MAX_AGE ils ne sont appliqués qu'une fois par connexion et
+    non à chaque requête. Le mode WAL, lui, est enregistré dans la base par la
+    migration 0010_sqlite_wal.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ProcessedEvent
+
+
+class EventDeduplicator:
+    """Écarte les événements déjà traités et les versions périmées avant tout accès à la base.
+
+    Deux LRU bornés en mémoire : les identifiants de messages traités, et la
+    dernière version vue par (source, produit). En option (EVENT_DEDUP_PERSIST),
+    les identifiants sont aussi enregistrés dans ProcessedEvent, dans la
+    transaction du traitement, pour survivre aux redémarrages du consumer ;
+    ceux plus vieux que EVENT_DEDUP_RETENTION sont purgés au fil des écritures.
+    """
+
+    # Intervalle minimal (secondes) entre deux purges de ProcessedEvent
+    PURGE_INTERVAL = 3600
+
+    def __init__(self, size=None, persist=None, retention=None):
+        self.size = size or settings.EVENT_DEDUP_CACHE_SIZE
+        self.persist = settings.EVENT_DEDUP_PERSIST if persist is None else persist
+        self.retention = settings.EVENT_DEDUP_RETENTION if retention is None else retention
+        self._next_purge = 0.0
+        self._seen = OrderedDict()
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, lru, key, value):
+        lru[key] = value
+        lru.move_to_end(key)
+        if len(lru) > self.size:
+            lru.popitem(last=False)
+
+    def filter_new(self, messages, key):
+        """Retourne les messages jamais traités ; ``key(message)`` donne leur identifiant (ou None)"""
+        fresh = []
+        batch_keys = set()
+        with self._lock:
+            for message in messages:
+                message_key = key(message)
+                if message_key is None:
+                    fresh.append(message)
+                    continue
+                if message_key in self._seen:
+                    self._seen.move_to_end(message_key)
+                    continue
+                if message_key in batch_keys:
+                    continue
+                batch_keys.add(message_key)
+                fresh.append(message)
+
+        if self.persist and batch_keys:
+            known = set(
+                ProcessedEvent.objects.filter(message_id__in=batch_keys).values_list('message_id', flat=True)
+            )
+            if known:
+                fresh = [message for message in fresh if key(message) not in known]
+        return fresh
+
+    def persist_processed(self, keys):
+        """Enregistre les identifiants en base (à appeler dans la transaction du traitement)"""
+        if self.persist and keys:
+            ProcessedEvent.objects.bulk_create(
+                [ProcessedEvent(message_id=message_key) for message_key in keys],
+                ignore_conflicts=True
+            )
+            if time.monotonic() >= self._next_purge:
+                self.purge_processed()
+
+    def purge_processed(self):
+        """Supprime les identifiants enregistrés depuis plus de ``retention`` secondes ; renvoie leur nombre"""
+        self._next_purge = time.monotonic() + self.PURGE_INTERVAL
+        deleted, _ = ProcessedEvent.objects.filter(
+            processed_at__lt=timezone.now() - timedelta(seconds=self.retention)
+        ).delete()
+        return deleted
+
+    def remember_processed(self, keys):
+        """Ajoute les identifiants au LRU (après le commit du traitement)"""
+        with self._lock:
+            for message_key in keys:
+                self._remember(self._seen, message_key, True)
+
+    def is_stale(self, source, product_id, version):
+        """Vrai si une version supérieure ou égale a déjà été appliquée pour ce produit"""
+        with self._lock:
+            last_version = self._versions.get((source, product_id))
+        return last_version is not None and version <= last_version
+
+    def remember_version(self, source, product_id, version):
+        with self._lock:
+            last_version = self._versions.get((source, product_id))
+            if last_version is None or version > last_version:
+                self._remember(self._versions, (source, product_id), version)
+
+
+_deduplicator = None
+_deduplicator_lock = threading.Lock()
+
+
+def get_deduplicator():
+    """Retourne le dédoublonneur partagé du processus courant"""
+    global _deduplicator
+    if _deduplicator is None:
+        with _deduplicator_lock:
+            if _deduplicator is None:
+                _deduplicator = EventDeduplicator()
+    return _deduplicator
+
+
+def reset_deduplicator():
+    """Oublie l'état de déduplication (tests, changement de configuration)"""
+    global _deduplicator
+    with _deduplicator_lock:
+        _deduplicator = None
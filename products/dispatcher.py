@@ -0,0 +1,203 @@
+import atexit
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .middleware import event_dispatch_lag_seconds, event_dispatch_overflow_total, event_dispatch_queue_depth
+from .transport import get_transport
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_SPILL = 'spill'
+
+
+@contextmanager
+def _file_lock(path, blocking=True):
+    """Verrou flock partagé par tous les processus (et threads) qui utilisent ``path``.
+
+    Renvoie False sans attendre si ``blocking`` est faux et que le verrou est déjà pris.
+    """
+    with open(path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class EventDispatcher:
+    """Publie les événements en arrière-plan, hors du cycle de la requête HTTP.
+
+    Les vues déposent les événements dans une file bornée ; un thread dédié la
+    vide par lots vers le broker. Quand la file est pleine, la politique de
+    débordement décide : attendre (block), jeter le plus ancien (drop_oldest)
+    ou écrire l'événement sur disque (spill) pour le republier plus tard.
+    """
+
+    def __init__(self, publisher=None, maxsize=None, batch_size=None, overflow=None,
+                 spill_path=None, block_timeout=None, retry_delay=1.0):
+        self.publisher = publisher
+        self.batch_size = batch_size or settings.EVENT_DISPATCH_BATCH_SIZE
+        self.overflow = overflow or settings.EVENT_QUEUE_OVERFLOW
+        if self.overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_SPILL):
+            raise ValueError(f"Politique de débordement inconnue : {self.overflow}")
+        self.spill_path = str(spill_path or settings.EVENT_SPILL_PATH)
+        self.block_timeout = block_timeout if block_timeout is not None else settings.EVENT_QUEUE_BLOCK_TIMEOUT
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=maxsize or settings.EVENT_QUEUE_MAXSIZE)
+        self._thread = None
+
+    def start(self):
+        """Démarre le thread de publication"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name='event-dispatcher')
+            self._thread.start()
+
+    def enqueue(self, routing_key, message):
+        """Met un événement en file sans jamais attendre le broker"""
+        item = (time.time(), routing_key, message)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._overflow(item)
+        event_dispatch_queue_depth.set(self._queue.qsize())
+
+    def _overflow(self, item):
+        event_dispatch_overflow_total.labels(policy=self.overflow).inc()
+        if self.overflow == OVERFLOW_BLOCK:
+            try:
+                self._queue.put(item, timeout=self.block_timeout)
+            except queue.Full:
+                print(f"⚠️ Event queue full, dropping {item[1]} event")
+        elif self.overflow == OVERFLOW_DROP_OLDEST:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        dropped = self._queue.get_nowait()
+                        print(f"⚠️ Event queue full, dropping oldest {dropped[1]} event")
+                    except queue.Empty:
+                        pass
+        else:
+            self._spill([item])
+
+    def _spill(self, items):
+        """Ajoute des événements au fichier de débordement (NDJSON)"""
+        # Le fichier est partagé par tous les workers : l'écriture se fait sous le verrou
+        # qui protège aussi sa mise de côté par _drain_spill
+        with _file_lock(self.spill_path + '.lock'):
+            with open(self.spill_path, 'a', encoding='utf-8') as spill_file:
+                for enqueued_at, routing_key, message in items:
+                    spill_file.write(json.dumps({
+                        'enqueued_at': enqueued_at,
+                        'routing_key': routing_key,
+                        'message': message
+                    }) + '\n')
+
+    def _next_batch(self, timeout=None):
+        """Bloque jusqu'au premier événement puis complète le lot sans attendre"""
+        batch = [self._queue.get(timeout=timeout)]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        event_dispatch_queue_depth.set(self._queue.qsize())
+        return batch
+
+    def _publish(self, batch):
+        publisher = self.publisher or get_transport()
+        publisher.publish_batch([(routing_key, message) for _, routing_key, message in batch])
+        event_dispatch_lag_seconds.set(time.time() - batch[0][0])
+
+    def _drain_spill(self):
+        """Republie les événements écrits sur disque une fois le broker disponible"""
+        draining_path = self.spill_path + '.draining'
+        if not os.path.exists(self.spill_path) and not os.path.exists(draining_path):
+            return
+        # Un seul worker republie à la fois ; les autres réessaieront au prochain passage
+        with _file_lock(self.spill_path + '.drain.lock', blocking=False) as acquired:
+            if not acquired:
+                return
+            if not os.path.exists(draining_path):
+                with _file_lock(self.spill_path + '.lock'):
+                    if not os.path.exists(self.spill_path):
+                        return
+                    os.replace(self.spill_path, draining_path)
+
+            with open(draining_path, encoding='utf-8') as spill_file:
+                batch = []
+                for line in spill_file:
+                    entry = json.loads(line)
+                    batch.append((entry['enqueued_at'], entry['routing_key'], entry['message']))
+                    if len(batch) >= self.batch_size:
+                        self._publish(batch)
+                        batch = []
+                if batch:
+                    self._publish(batch)
+            os.remove(draining_path)
+
+    def _run(self):
+        batch = None
+        while True:
+            try:
+                if batch is None:
+                    try:
+                        batch = self._next_batch(timeout=self.retry_delay)
+                    except queue.Empty:
+                        batch = None
+                if batch is not None:
+                    self._publish(batch)
+                    batch = None
+                if self.overflow == OVERFLOW_SPILL:
+                    self._drain_spill()
+            except Exception as e:
+                # Le lot est conservé et republié après une pause
+                print(f"❌ Event dispatch failed, retrying in {self.retry_delay}s: {e}")
+                time.sleep(self.retry_delay)
+
+    def flush(self, timeout=5.0):
+        """Publie de façon synchrone ce qui reste en file (arrêt du processus)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                batch = self._next_batch(timeout=0)
+            except queue.Empty:
+                return
+            try:
+                self._publish(batch)
+            except Exception as e:
+                if self.overflow == OVERFLOW_SPILL:
+                    self._spill(batch)
+                print(f"❌ Event flush failed: {e}")
+                return
+
+
+_dispatcher = None
+_dispatcher_pid = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Retourne le dispatcher du processus courant, démarré à la première utilisation"""
+    global _dispatcher, _dispatcher_pid
+    if _dispatcher is None or _dispatcher_pid != os.getpid():
+        with _dispatcher_lock:
+            if _dispatcher is None or _dispatcher_pid != os.getpid():
+                _dispatcher = EventDispatcher()
+                _dispatcher_pid = os.getpid()
+                _dispatcher.start()
+                atexit.register(_dispatcher.flush)
+    return _dispatcher
@@ -0,0 +1,97 @@
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+
+# Tris acceptés par ?ordering= (préfixe "-" pour l'ordre décroissant) ; chacun est
+# servi par un index (champ, id) — voir Product.Meta.indexes
+ORDERING_FIELDS = ('price', 'stock', 'name', 'id')
+
+AVAILABLE_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+
+def _decimal_param(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        value = None
+    if value is None or not value.is_finite() or value < 0:
+        raise ValidationError({'message': f'Le paramètre {name} doit être un nombre positif'})
+    return value
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValidationError({'message': f'Le paramètre {name} doit être un entier positif'})
+    return value
+
+
+def _default_ordering(params):
+    # Sans tri explicite, la liste filtrée suit l'index du filtre : l'intervalle
+    # demandé est lu dans l'ordre de l'index au lieu de parcourir toute la table par id
+    if 'min_price' in params or 'max_price' in params:
+        return 'price'
+    if 'min_stock' in params or 'available' in params:
+        return 'stock'
+    return 'id'
+
+
+def get_ordering(params):
+    """Tri demandé, toujours départagé par l'id pour un ordre stable (pagination)"""
+    ordering = params.get('ordering') or _default_ordering(params)
+    if ordering.lstrip('-') not in ORDERING_FIELDS:
+        raise ValidationError({
+            'message': f"Tri inconnu : {ordering} (valeurs possibles : {', '.join(ORDERING_FIELDS)})"
+        })
+    if ordering.lstrip('-') == 'id':
+        return (ordering,)
+    return (ordering, '-id' if ordering.startswith('-') else 'id')
+
+
+def filter_products(queryset, params, ordering=None):
+    """Applique min_price, max_price, min_stock et available ; lève ValidationError sur une valeur invalide.
+
+    Avec ``ordering`` (voir ``get_ordering``), la liste est aussi triée.
+    """
+    min_price = _decimal_param(params, 'min_price')
+    max_price = _decimal_param(params, 'max_price')
+    min_stock = _int_param(params, 'min_stock')
+    filtered = queryset
+    # Colonnes filtrées, chacune servie par son index (champ, id)
+    columns = set()
+
+    if min_price is not None:
+        filtered = filtered.filter(price__gte=min_price)
+        columns.add('price')
+    if max_price is not None:
+        filtered = filtered.filter(price__lte=max_price)
+        columns.add('price')
+    if min_stock is not None:
+        filtered = filtered.filter(stock__gte=min_stock)
+        columns.add('stock')
+
+    available = params.get('available')
+    if available is not None:
+        if available.lower() not in AVAILABLE_VALUES:
+            raise ValidationError({'message': 'Le paramètre available doit valoir true ou false'})
+        in_stock = AVAILABLE_VALUES[available.lower()]
+        filtered = filtered.filter(stock__gt=0) if in_stock else filtered.filter(stock__lte=0)
+        columns.add('stock')
+
+    if ordering is None:
+        return filtered
+    if columns and ordering[0].lstrip('-') not in columns:
+        # Filtre et tri sur des colonnes différentes : SQLite préfère parcourir toute la
+        # table dans l'ordre de l'index du tri. Les ids sont d'abord lus par une recherche
+        # d'intervalle sur l'index du filtre, seules ces lignes sont ensuite triées
+        filtered = queryset.filter(pk__in=filtered.values('pk'))
+    return filtered.order_by(*ordering)
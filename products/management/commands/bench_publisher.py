@@ -0,0 +1,54 @@
+import json
+import time
+
+import pika
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.publisher import RabbitMQPublisher
+
+
+class Command(BaseCommand):
+    help = "Compare le débit de publication : connexion par message vs publisher persistant"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000)
+        parser.add_argument('--routing-key', default='bench.publisher')
+        parser.add_argument('--confirms', action='store_true', help="Active les publisher confirms")
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        routing_key = options['routing_key']
+        message = {'product_id': 1, 'new_stock': 1, 'timestamp': time.time()}
+
+        def connection_per_message():
+            for _ in range(count):
+                connection = pika.BlockingConnection(pika.ConnectionParameters(settings.RABBITMQ_HOST))
+                channel = connection.channel()
+                channel.exchange_declare(exchange=settings.RABBITMQ_EXCHANGE, exchange_type='topic', durable=True)
+                if options['confirms']:
+                    channel.confirm_delivery()
+                channel.basic_publish(
+                    exchange=settings.RABBITMQ_EXCHANGE,
+                    routing_key=routing_key,
+                    body=json.dumps(message)
+                )
+                connection.close()
+
+        def persistent_publisher():
+            publisher = RabbitMQPublisher(confirms=options['confirms'])
+            for _ in range(count):
+                publisher.publish(routing_key, message)
+            publisher.close()
+
+        results = {}
+        for name, run in (('connection_per_message', connection_per_message),
+                          ('persistent_publisher', persistent_publisher)):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            results[name] = count / elapsed
+            self.stdout.write(f"{name}: {results[name]:.0f} msg/s ({count} messages en {elapsed:.2f}s)")
+
+        speedup = results['persistent_publisher'] / results['connection_per_message']
+        self.stdout.write(self.style.SUCCESS(f"Gain du publisher persistant : x{speedup:.1f}"))
@@ -0,0 +1,88 @@
+import random
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from products.models import Product
+from products.search import RankedSearchResults, fts_available, scan_products, search_terms
+
+WORDS = (
+    'chaise', 'table', 'lampe', 'bureau', 'canapé', 'étagère', 'tapis', 'miroir', 'coussin', 'rideau',
+    'bois', 'métal', 'verre', 'cuir', 'tissu', 'chêne', 'noyer', 'acier', 'laiton', 'velours',
+    'rouge', 'bleu', 'vert', 'noir', 'blanc', 'gris', 'beige', 'doré', 'argenté', 'naturel',
+    'moderne', 'vintage', 'industriel', 'scandinave', 'rustique', 'compact', 'pliant', 'extensible',
+)
+
+
+class Command(BaseCommand):
+    help = "Compare la recherche FTS5 à un scan icontains sur un catalogue généré (base de test jetable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--queries', nargs='+', default=['chaise', 'table chêne', 'scandinave noir', 'bako', 'kori'])
+
+    def handle(self, *args, **options):
+        # Base de test créée puis détruite : le catalogue réel n'est pas touché
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            self.seed(options['products'])
+            if not fts_available():
+                self.stderr.write("FTS5 indisponible sur cette base : seul le scan est mesuré")
+            for query in options['queries']:
+                self.bench(query, options['repeat'], options['page_size'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def vocabulary(self, rng, size=20000):
+        """Mots courants puis mots rares générés : fréquences à la Zipf, comme un vrai catalogue"""
+        syllables = ('ba', 'ko', 'ri', 'lu', 'mé', 'sa', 'to', 'vi', 'ne', 'pa', 'do', 'gu', 'fi', 'zo')
+        generated = {''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(size)}
+        words = list(WORDS) + sorted(generated - set(WORDS))
+        cum_weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+        return words, cum_weights
+
+    def seed(self, count):
+        rng = random.Random(42)
+        words, cum_weights = self.vocabulary(rng)
+        started = time.perf_counter()
+        products = (
+            Product(
+                name=' '.join(rng.choices(words, cum_weights=cum_weights, k=3)),
+                description=' '.join(rng.choices(words, cum_weights=cum_weights, k=20)),
+                price='9.99',
+                stock=rng.randint(0, 100)
+            )
+            for _ in range(count)
+        )
+        batch = []
+        for product in products:
+            batch.append(product)
+            if len(batch) >= 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        self.stdout.write(f"{count} produits créés en {time.perf_counter() - started:.1f}s")
+
+    def bench(self, query, repeat, page_size):
+        terms = search_terms(query)
+        runs = [('icontains', lambda: (scan_products(terms).count(), list(scan_products(terms)[:page_size])))]
+        if fts_available():
+            results = RankedSearchResults(terms)
+            runs.append(('fts5', lambda: (results.count(), results[:page_size])))
+
+        timings = {}
+        for name, run in runs:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                total, page = run()
+            timings[name] = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(f"{query!r} {name}: {timings[name]:.1f} ms/requête ({total} résultats)")
+
+        if 'fts5' in timings:
+            self.stdout.write(self.style.SUCCESS(
+                f"{query!r} gain FTS5 : x{timings['icontains'] / timings['fts5']:.1f}"
+            ))
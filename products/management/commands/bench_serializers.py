@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Product
+from products.serializers import ProductSerializer, product_fields, serialize_product_rows
+
+
+class Command(BaseCommand):
+    help = "Compare ProductSerializer et la sérialisation rapide (values()) par tranche de 10k lignes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Base de test créée puis détruite : le catalogue réel n'est pas touché
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            self.seed(options['rows'])
+            self.bench(options['rows'], options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, count):
+        Product.objects.bulk_create(
+            [
+                Product(name=f'Produit {i}', description=f'Description du produit {i}', price=f'{i % 1000}.{i % 100:02d}', stock=i % 50)
+                for i in range(count)
+            ],
+            batch_size=5000
+        )
+
+    def timed(self, run, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        return (time.perf_counter() - started) / repeat
+
+    def bench(self, count, repeat):
+        queryset = Product.objects.order_by('id')
+        instances = list(queryset)
+        rows = list(queryset.values(*product_fields()))
+        renderer = JSONRenderer()
+        per_10k = 10000 / count
+
+        cases = (
+            ('sérialisation seule', lambda: ProductSerializer(instances, many=True).data,
+             lambda: serialize_product_rows(rows)),
+            ('requête + sérialisation + JSON', lambda: renderer.render(ProductSerializer(queryset.all(), many=True).data),
+             lambda: renderer.render(serialize_product_rows(queryset.values(*product_fields())))),
+        )
+        for name, slow, fast in cases:
+            slow_time, fast_time = self.timed(slow, repeat), self.timed(fast, repeat)
+            self.stdout.write(
+                f"{name} : ProductSerializer {slow_time * per_10k * 1000:.1f} ms/10k, "
+                f"values() {fast_time * per_10k * 1000:.1f} ms/10k"
+            )
+            self.stdout.write(self.style.SUCCESS(f"{name} : gain x{slow_time / fast_time:.1f}"))
@@ -0,0 +1,101 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+
+from products.benchmarks import seed_products
+from products.models import InsufficientStock, Product
+
+# Réglages SQLite d'origine (journal rollback, fsync à chaque commit, timeout sqlite3 par défaut)
+DEFAULT_PRAGMAS = {
+    'SQLITE_SYNCHRONOUS': 'FULL',
+    'SQLITE_BUSY_TIMEOUT': 5000,
+    'SQLITE_MMAP_SIZE': 0,
+    'SQLITE_CACHE_SIZE': -2000,
+}
+
+
+class Command(BaseCommand):
+    help = "Débit lectures/écritures concurrentes sur SQLite : réglages par défaut vs WAL et settings SQLITE_*"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0, help="Durée (s) de chaque mesure")
+
+    def handle(self, *args, **options):
+        # Base de test sur disque (une base en mémoire ne journalise pas et ne verrouille pas le fichier)
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        test_settings['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench_sqlite.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            seed_products(options['products'])
+            self.product_ids = list(Product.objects.values_list('id', flat=True))
+            results = {}
+            for name, journal_mode, overrides in (('défaut', 'DELETE', DEFAULT_PRAGMAS), ('configuré', 'WAL', {})):
+                with override_settings(**overrides):
+                    results[name] = self.bench(
+                        journal_mode, options['readers'], options['writers'], options['duration']
+                    )
+                reads, writes, locked = results[name]
+                self.stdout.write(
+                    f"{name} : {reads:.0f} lectures/s, {writes:.0f} écritures/s, {locked} 'database is locked'"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        (default_reads, default_writes, _), (reads, writes, _) = results['défaut'], results['configuré']
+        self.stdout.write(self.style.SUCCESS(
+            f"Gain : lectures x{reads / max(default_reads, 1):.1f}, écritures x{writes / max(default_writes, 1):.1f}"
+        ))
+
+    def bench(self, journal_mode, readers, writers, duration):
+        # Connexion principale rouverte seule : journal_mode ne change que sans autre connexion
+        # (la base de test est en WAL après migrate, comme la base réelle)
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+
+        counts = {'read': 0, 'write': 0, 'locked': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def worker(kind, seed):
+            rng = random.Random(seed)
+            done = locked = 0
+            try:
+                while not stop.is_set():
+                    product_id = rng.choice(self.product_ids)
+                    try:
+                        if kind == 'read':
+                            Product.objects.filter(id=product_id).values('id', 'stock', 'version').first()
+                        else:
+                            Product.objects.adjust_stock(product_id, rng.choice((-1, 1)))
+                        done += 1
+                    except InsufficientStock:
+                        done += 1
+                    except OperationalError:
+                        locked += 1
+            finally:
+                connections.close_all()
+                with lock:
+                    counts[kind] += done
+                    counts['locked'] += locked
+
+        threads = [threading.Thread(target=worker, args=('read', i)) for i in range(readers)]
+        threads += [threading.Thread(target=worker, args=('write', readers + i)) for i in range(writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return counts['read'] / elapsed, counts['write'] / elapsed, counts['locked']
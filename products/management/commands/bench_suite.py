@@ -0,0 +1,64 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from products.benchmarks import BenchmarkSuite, compare_to_baseline, seed_products
+
+
+class Command(BaseCommand):
+    help = "Mesure débit et latences (p50/p95/p99) des endpoints produits et du pipeline d'événements"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help="Taille du catalogue (10k à 1M)")
+        parser.add_argument('--requests', type=int, default=200, help="Requêtes par scénario")
+        parser.add_argument('--scenario', action='append', dest='scenarios', help="Limite aux scénarios nommés")
+        parser.add_argument('--output', help="Écrit le rapport JSON dans ce fichier")
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmarks' / 'baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true', help="Remplace la baseline par ce rapport")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Dégradation du p95 tolérée (0.2 = +20 %%)")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        # Base de test créée puis détruite : le catalogue réel n'est pas touché
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            seed_products(options['products'])
+            report = BenchmarkSuite(requests=options['requests']).run(options['scenarios'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        rendered = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(rendered + '\n')
+        self.stdout.write(rendered)
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(rendered + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline enregistrée : {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f"Pas de baseline ({baseline_path}), comparaison ignorée"))
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline['meta']['products'] != report['meta']['products']:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline mesurée sur {baseline['meta']['products']} produits, comparaison indicative"
+            ))
+        regressions = []
+        for name, (reference, current, ratio, regressed) in compare_to_baseline(
+                report, baseline, options['tolerance']).items():
+            line = f"{name} : p95 {reference:.2f} ms → {current:.2f} ms (x{ratio})"
+            if regressed:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"{line} régression"))
+            else:
+                self.stdout.write(line)
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"Régression de latence : {', '.join(regressions)}")
@@ -0,0 +1,84 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def serve_metrics(port):
+    """Expose le registre Prometheus du processus consumer (mesures des handlers, reconnexions...)"""
+    if port:
+        from prometheus_client import start_http_server
+        start_http_server(port)
+        print(f"📊 Métriques du consumer sur le port {port}")
+
+
+def run_worker(prefetch_count, batch_size, metrics_port=0):
+    """Point d'entrée d'un processus consumer (sa propre connexion, son propre prefetch)"""
+    import django
+    django.setup()
+
+    serve_metrics(metrics_port)
+    from products.service_product import consume_events
+    consume_events(prefetch_count=prefetch_count, batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = "Lance un pool de processus consumers RabbitMQ, indépendant des workers web"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.EVENT_CONSUMER_WORKERS)
+        parser.add_argument('--prefetch', type=int, default=settings.RABBITMQ_PREFETCH_COUNT)
+        parser.add_argument('--batch-size', type=int, default=settings.EVENT_CONSUMER_BATCH_SIZE)
+        parser.add_argument('--metrics-port', type=int, default=settings.EVENT_CONSUMER_METRICS_PORT)
+
+    def handle(self, *args, **options):
+        from products.transport import TRANSPORT_INPROCESS
+        if settings.EVENT_TRANSPORT == TRANSPORT_INPROCESS:
+            # Les événements en mémoire ne sortent pas du processus qui les publie
+            raise CommandError("EVENT_TRANSPORT=inprocess : le consumer tourne dans le processus web")
+
+        workers = options['workers']
+        worker_args = (options['prefetch'], options['batch_size'])
+        metrics_port = options['metrics_port']
+
+        if workers <= 1:
+            serve_metrics(metrics_port)
+            from products.service_product import consume_events
+            consume_events(*worker_args)
+            return
+
+        # Les connexions ouvertes ne doivent pas être partagées avec les enfants
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+
+        def start(index):
+            # Un port par worker : chaque processus a son propre registre
+            port = metrics_port + index if metrics_port else 0
+            process = context.Process(target=run_worker, args=(*worker_args, port), name=f'consumer-{index}',
+                                      daemon=True)
+            process.start()
+            return process
+
+        processes = [start(index) for index in range(workers)]
+        self.stdout.write(f"🚀 {workers} consumers démarrés (prefetch={worker_args[0]})")
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        try:
+            while not stopping:
+                # Un consumer mort est relancé
+                for index, process in enumerate(processes):
+                    if not process.is_alive():
+                        self.stderr.write(f"⚠️ {process.name} arrêté (code {process.exitcode}), relance")
+                        processes[index] = start(index)
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join(timeout=10)
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.outbox import relay_pending_events
+from products.publisher import RabbitMQPublisher
+
+
+class Command(BaseCommand):
+    help = "Relaie les événements de l'outbox vers RabbitMQ par lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_RELAY_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Pause (s) quand l'outbox est vide")
+        parser.add_argument('--once', action='store_true', help="Vide l'outbox puis s'arrête")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # Les confirms garantissent que le broker a bien reçu le lot avant de le marquer envoyé
+        publisher = RabbitMQPublisher(confirms=True)
+        self.stdout.write("🚀 Relais de l'outbox démarré")
+        try:
+            while True:
+                try:
+                    relayed = relay_pending_events(publisher, batch_size)
+                except Exception as e:
+                    self.stderr.write(f"❌ Outbox relay failed: {e}")
+                    if options['once']:
+                        raise
+                    time.sleep(options['interval'])
+                    continue
+
+                if relayed:
+                    self.stdout.write(f"📤 {relayed} événements relayés")
+                if relayed < batch_size:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        finally:
+            publisher.close()
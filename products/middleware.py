@@ -1,6 +1,5 @@
 import time
 import json
-import pika
 from prometheus_client import Counter, Histogram, Gauge
 from django.utils.deprecation import MiddlewareMixin
 from django.http import JsonResponse
@@ -30,6 +29,49 @@ rabbitmq_queue_size = Gauge(
     ['queue']
 )
 
+rabbitmq_queue_consumers = Gauge(
+    'rabbitmq_queue_consumers',
+    'Nombre de consumers abonnés à la file',
+    ['queue']
+)
+
+rabbitmq_queue_lag_seconds = Gauge(
+    'rabbitmq_queue_lag_seconds',
+    'Temps écoulé depuis que la file a été vue vide pour la dernière fois',
+    ['queue']
+)
+
+rabbitmq_publish_duration_seconds = Histogram(
+    'rabbitmq_publish_duration_seconds',
+    'Durée de publication d\'un message sur le broker',
+    ['routing_key']
+)
+
+rabbitmq_handler_duration_seconds = Histogram(
+    'rabbitmq_handler_duration_seconds',
+    'Durée de traitement d\'un lot de messages consommés',
+    ['routing_key']
+)
+
+rabbitmq_message_age_seconds = Histogram(
+    'rabbitmq_message_age_seconds',
+    'Âge des messages au moment de leur traitement (maintenant - timestamp)',
+    ['routing_key'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, float('inf'))
+)
+
+rabbitmq_failures_total = Counter(
+    'rabbitmq_failures_total',
+    'Échecs de publication ou de traitement de messages',
+    ['routing_key', 'stage']
+)
+
+rabbitmq_reconnects_total = Counter(
+    'rabbitmq_reconnects_total',
+    'Reconnexions au broker',
+    ['component']
+)
+
 api_calls_total = Counter(
     'api_calls_total',
     'Total des appels API externes',
@@ -42,34 +84,89 @@ api_call_duration_seconds = Histogram(
     ['target_service', 'endpoint']
 )
 
+event_dispatch_queue_depth = Gauge(
+    'event_dispatch_queue_depth',
+    'Nombre d\'événements en attente de publication'
+)
 
-class MetricsMiddleware(MiddlewareMixin):
-    """Middleware pour collecter les métriques personnalisées"""
-    
-    def process_request(self, request):
-        request.start_time = time.time()
-    
-    def process_response(self, request, response):
-        if hasattr(request, 'start_time'):
-            duration = time.time() - request.start_time
-            
-            # Métriques HTTP
-            method = request.method
-            endpoint = request.path
-            status_code = response.status_code
-            
+event_dispatch_lag_seconds = Gauge(
+    'event_dispatch_lag_seconds',
+    'Délai entre la mise en file et la publication du dernier lot d\'événements'
+)
+
+event_dispatch_overflow_total = Counter(
+    'event_dispatch_overflow_total',
+    'Événements ayant débordé de la file de publication',
+    ['policy']
+)
+
+product_cache_requests_total = Counter(
+    'product_cache_requests_total',
+    'Lectures du cache produit',
+    ['cache', 'result']
+)
+
+product_cache_evictions_total = Counter(
+    'product_cache_evictions_total',
+    'Entrées retirées du cache produit',
+    ['reason']
+)
+
+
+# Étiquette des requêtes qui ne correspondent à aucune route (404, scans...)
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# Séries (compteur, histogramme) déjà résolues, par (méthode, route, statut)
+_http_metric_children = {}
+
+
+def endpoint_label(request):
+    """Gabarit de la route résolue (ex. /api/products/<int:pk>/) : une série par route, pas par URL"""
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None or resolver_match.route is None:
+        return UNMATCHED_ENDPOINT
+    return '/' + resolver_match.route
+
+
+def _http_metric_child(method, endpoint, status_code):
+    key = (method, endpoint, status_code)
+    children = _http_metric_children.get(key)
+    if children is None:
+        children = _http_metric_children.setdefault(key, (
             http_requests_total.labels(
                 method=method,
                 endpoint=endpoint,
                 status_code=status_code,
                 service='product'
-            ).inc()
-            
+            ),
             http_request_duration_seconds.labels(
                 method=method,
                 endpoint=endpoint,
                 service='product'
-            ).observe(duration)
+            )
+        ))
+    return children
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Middleware pour collecter les métriques personnalisées"""
+    
+    def process_request(self, request):
+        request.start_time = time.perf_counter()
+    
+    def process_response(self, request, response):
+        if hasattr(request, 'start_time'):
+            duration = time.perf_counter() - request.start_time
+            
+            # Métriques HTTP, étiquetées par route pour borner le nombre de séries
+            method = request.method if request.method in KNOWN_METHODS else 'other'
+            requests_child, duration_child = _http_metric_child(
+                method, endpoint_label(request), response.status_code
+            )
+            requests_child.inc()
+            duration_child.observe(duration)
         
         return response
 
@@ -84,6 +181,38 @@ def track_rabbitmq_message(queue, exchange, routing_key, action):
     ).inc()
 
 
+def track_publish(exchange, routing_key, duration, success=True):
+    """Enregistre la publication d'un message (réussie ou non)"""
+    rabbitmq_publish_duration_seconds.labels(routing_key=routing_key).observe(duration)
+    track_rabbitmq_message('', exchange, routing_key, 'published' if success else 'publish_failed')
+    if not success:
+        rabbitmq_failures_total.labels(routing_key=routing_key, stage='publish').inc()
+
+
+def track_handled(queue, exchange, routing_key, messages, duration, success=True):
+    """Enregistre le traitement d'un lot de messages consommés et l'âge de chacun"""
+    rabbitmq_handler_duration_seconds.labels(routing_key=routing_key).observe(duration)
+    now = time.time()
+    age = rabbitmq_message_age_seconds.labels(routing_key=routing_key)
+    for message in messages:
+        timestamp = message.get('timestamp') if isinstance(message, dict) else None
+        if isinstance(timestamp, (int, float)):
+            age.observe(max(now - timestamp, 0))
+    rabbitmq_messages_total.labels(
+        queue=queue,
+        exchange=exchange,
+        routing_key=routing_key,
+        action='consumed' if success else 'failed'
+    ).inc(len(messages))
+    if not success:
+        rabbitmq_failures_total.labels(routing_key=routing_key, stage='handler').inc()
+
+
+def track_reconnect(component):
+    """Compte une reconnexion au broker (publisher, consumer, queue sampler)"""
+    rabbitmq_reconnects_total.labels(component=component).inc()
+
+
 def track_api_call(target_service, endpoint, status_code, duration):
     """Fonction pour tracker les appels API externes"""
     api_calls_total.labels(
@@ -99,18 +228,6 @@ def track_api_call(target_service, endpoint, status_code, duration):
 
 
 def get_rabbitmq_queue_info():
-    """Récupère les informations sur les files d'attente RabbitMQ"""
-    try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters('rabbitmq'))
-        channel = connection.channel()
-        
-        # Récupérer les informations sur les files d'attente
-        method = channel.queue_declare(queue='product_service_queue', passive=True)
-        queue_size = method.method.message_count
-        rabbitmq_queue_size.labels(queue='product_service_queue').set(queue_size)
-        
-        connection.close()
-        return queue_size
-    except Exception as e:
-        print(f"Erreur lors de la récupération des infos RabbitMQ: {e}")
-        return 0
+    """Dernière mesure des files consommées, relevée en arrière-plan par le queue sampler (sans appel au broker)"""
+    from .queue_sampler import get_queue_sampler
+    return get_queue_sampler().snapshot()
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+# Le mode WAL est enregistré dans le fichier de base : il est activé une fois ici,
+# pas à chaque connexion (voir products.database pour les PRAGMA de connexion)
+def journal_mode(mode):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode = {mode}')
+    return operation
+
+
+class Migration(migrations.Migration):
+    # journal_mode ne peut pas changer à l'intérieur d'une transaction
+    atomic = False
+
+    dependencies = [
+        ('products', '0009_product_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(journal_mode('WAL'), journal_mode('DELETE')),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_sqlite_wal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='processedevent',
+            index=models.Index(fields=['processed_at'], name='processed_event_age_idx'),
+        ),
+    ]
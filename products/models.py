@@ -1,10 +1,175 @@
-from django.db import models
+from typing import NamedTuple
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.models import F
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
+
+
+class InsufficientStock(Exception):
+    """Le stock disponible ne couvre pas la quantité demandée"""
+
+
+class StockConflict(Exception):
+    """Le stock a changé en parallèle trop de fois pour être écrit"""
+
+
+class StockReservationFailed(Exception):
+    """Au moins une ligne d'une réservation ne peut pas être servie ; rien n'a été réservé"""
+
+    def __init__(self, failures):
+        super().__init__(f"Réservation impossible pour {len(failures)} produit(s)")
+        self.failures = failures
+
+
+class StockLevel(NamedTuple):
+    """Stock d'un produit et version de la ligne juste après une écriture"""
+    stock: int
+    version: int
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def _update_returning(self, columns, **updates):
+        """Exécute un UPDATE et renvoie les colonnes demandées des lignes modifiées, sans relecture"""
+        connection = connections[self.db]
+        if connection.vendor not in ('sqlite', 'postgresql') or not connection.features.can_return_columns_from_insert:
+            with transaction.atomic(using=self.db):
+                ids = list(self.select_for_update().values_list('pk', flat=True))
+                self.filter(pk__in=ids).update(**updates)
+                return list(self.model.objects.filter(pk__in=ids).values_list(*columns))
+
+        query = self.query.chain(UpdateQuery)
+        query.add_update_values(updates)
+        try:
+            sql, params = query.get_compiler(self.db).as_sql()
+        except EmptyResultSet:
+            # Filtre impossible (valeur hors des bornes de la colonne...) : aucune ligne touchée
+            return []
+        returning = ', '.join(connection.ops.quote_name(column) for column in columns)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} RETURNING {returning}", params)
+            return cursor.fetchall()
+
+    def adjust_stock(self, product_id, delta):
+        """Ajoute ``delta`` (positif ou négatif) au stock et renvoie le StockLevel obtenu.
+
+        Un seul ``UPDATE ... SET stock = stock + delta WHERE stock + delta >= 0`` :
+        pas de lecture préalable, donc pas de mise à jour perdue entre requêtes concurrentes.
+        """
+        queryset = self.filter(pk=product_id)
+        if delta < 0:
+            queryset = queryset.filter(stock__gte=-delta)
+        rows = queryset._update_returning(
+            ('stock', 'version'), stock=F('stock') + delta, version=F('version') + 1, updated_at=timezone.now()
+        )
+        if rows:
+            return StockLevel(*rows[0])
+        if not self.filter(pk=product_id).exists():
+            raise self.model.DoesNotExist(f"Produit {product_id} non trouvé")
+        raise InsufficientStock(f"Stock insuffisant pour le produit {product_id}")
+
+    def reserve_stock(self, quantities):
+        """Décrémente plusieurs produits en tout-ou-rien et renvoie {product_id: StockLevel}.
+
+        ``quantities`` associe chaque product_id à la quantité à réserver. Les produits
+        sont traités par id croissant pour que deux réservations concurrentes prennent
+        les verrous dans le même ordre.
+        """
+        levels = {}
+        failures = []
+        with transaction.atomic(using=self.db):
+            for product_id in sorted(quantities):
+                try:
+                    levels[product_id] = self.adjust_stock(product_id, -quantities[product_id])
+                except self.model.DoesNotExist:
+                    failures.append({'product_id': product_id, 'reason': 'not_found'})
+                except InsufficientStock:
+                    failures.append({'product_id': product_id, 'reason': 'insufficient_stock'})
+            if failures:
+                # Sortie de l'atomic par exception : toutes les décrémentations sont annulées
+                raise StockReservationFailed(failures)
+        return levels
+
+    def set_stock(self, product_id, new_stock, retries=5):
+        """Remplace le stock par compare-and-set et renvoie (ancien stock, StockLevel)"""
+        for _ in range(retries):
+            old_stock, version = self.filter(pk=product_id).values_list('stock', 'version').get()
+            # La version sert de jeton : elle change à chaque écriture concurrente
+            updated = self.filter(pk=product_id, version=version).update(
+                stock=new_stock, version=version + 1, updated_at=timezone.now()
+            )
+            if updated:
+                return old_stock, StockLevel(new_stock, version + 1)
+        raise StockConflict(f"Le stock du produit {product_id} change trop souvent")
+
 
 class Product(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField()
+    # Incrémentée à chaque écriture ; portée par les événements pour écarter les versions périmées
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Renseigné aussi par les écritures en masse (update, bulk_update), qui ne passent pas par save()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Produits en stock faible, triés par stock (keyset sur stock, id)
+            models.Index(fields=['stock', 'id'], name='product_stock_idx'),
+            # Filtres de prix et tris de la liste (?min_price=, ?ordering=price|name)
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        # Incrément en SQL : l'instance peut être antérieure à une écriture concurrente
+        # (adjust_stock, set_stock), dont la version ne doit pas être réutilisée
+        self.version = F('version') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version', 'updated_at'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+
+
+class OutboxEvent(models.Model):
+    """Événement à publier, écrit dans la même transaction que la modification du produit"""
+    routing_key = models.CharField(max_length=100)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Index partiel : seuls les événements en attente sont parcourus par le relais
+            models.Index(fields=['id'], condition=models.Q(sent_at__isnull=True), name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.routing_key} #{self.id}"
+
+
+class ProcessedEvent(models.Model):
+    """Identifiant d'un événement déjà traité par un consumer (déduplication persistante)"""
+    message_id = models.CharField(max_length=64, unique=True)
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Purge des identifiants plus vieux que EVENT_DEDUP_RETENTION
+            models.Index(fields=['processed_at'], name='processed_event_age_idx'),
+        ]
+
+    def __str__(self):
+        return self.message_id
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+
+def write_outbox_event(routing_key, message):
+    """Enregistre un événement dans l'outbox (transaction de l'appelant)"""
+    return OutboxEvent.objects.create(routing_key=routing_key, payload=message)
+
+
+def relay_pending_events(publisher, batch_size=None):
+    """Publie un lot d'événements en attente, dans l'ordre, puis les marque envoyés.
+
+    Retourne le nombre d'événements relayés. Si la publication échoue, rien n'est
+    marqué et le lot sera republié au prochain passage (livraison au moins une fois).
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    events = list(
+        OutboxEvent.objects
+        .filter(sent_at__isnull=True)
+        .order_by('id')
+        .values_list('id', 'routing_key', 'payload')[:batch_size]
+    )
+    if not events:
+        return 0
+
+    publisher.publish_batch([(routing_key, payload) for _, routing_key, payload in events])
+    OutboxEvent.objects.filter(id__in=[event_id for event_id, _, _ in events]).update(sent_at=timezone.now())
+    return len(events)
@@ -0,0 +1,102 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProductCursorPagination(CursorPagination):
+    """Pagination par curseur (keyset) sur le tri de la liste (l'id par défaut).
+
+    Activée à la demande : sans paramètre ``cursor`` ni ``page_size``, la liste
+    complète est renvoyée comme avant.
+    """
+    ordering = 'id'
+    page_size = settings.PRODUCT_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PRODUCT_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        # Tri choisi par la vue (?ordering=), l'id servant de départage
+        if view is not None and hasattr(view, 'get_ordering'):
+            return view.get_ordering()
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class StockKeysetPagination(BasePagination):
+    """Pagination keyset sur (stock, id) pour les listes triées par stock.
+
+    Le curseur encode le couple (stock, id) de la dernière ligne servie : la page
+    suivante reprend par ``(stock, id) > (s, i)``, résolu directement par l'index
+    (stock, id), même quand beaucoup de produits ont le même stock.
+    """
+    page_size = settings.PRODUCT_PAGE_SIZE
+    max_page_size = settings.PRODUCT_MAX_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            return max(1, min(int(request.query_params[self.page_size_query_param]), self.max_page_size))
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            stock, product_id = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            return int(stock), int(product_id)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound('Curseur invalide')
+
+    def encode_cursor(self, position):
+        return urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        position = self.decode_cursor(request)
+        queryset = queryset.order_by('stock', 'id')
+        if position is not None:
+            quote = connections[queryset.db].ops.quote_name
+            table = quote(queryset.model._meta.db_table)
+            queryset = queryset.filter(RawSQL(
+                f'({table}.{quote("stock")}, {table}.{quote("id")}) > (%s, %s)', position,
+                output_field=BooleanField()
+            ))
+
+        page_size = self.get_page_size(request)
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        rows = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_position = (last['stock'], last['id']) if isinstance(last, dict) else (last.stock, last.id)
+        self.request = request
+        return rows
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+
+class ProductSearchPagination(PageNumberPagination):
+    """Pagination par numéro de page des résultats de recherche (triés par pertinence)"""
+    page_size = settings.PRODUCT_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PRODUCT_MAX_PAGE_SIZE
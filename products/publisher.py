@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+
+import pika
+from pika.exceptions import AMQPError
+from django.conf import settings
+
+from .middleware import track_publish, track_reconnect
+
+
+class RabbitMQPublisher:
+    """Publisher RabbitMQ persistant : une connexion et un channel par processus.
+
+    La connexion est ouverte au premier publish, l'exchange n'est déclaré qu'une
+    fois par connexion et une connexion perdue est rouverte à la demande.
+    pika n'étant pas thread-safe, l'accès au channel est protégé par un verrou.
+    """
+
+    def __init__(self, host=None, exchange=None, confirms=None):
+        self.host = host or settings.RABBITMQ_HOST
+        self.exchange = exchange or settings.RABBITMQ_EXCHANGE
+        if confirms is None:
+            confirms = settings.RABBITMQ_PUBLISHER_CONFIRMS
+        self.confirms = confirms
+        self._lock = threading.Lock()
+        self._connection = None
+        self._channel = None
+        self._pid = None
+        self._connected = False
+
+    def _connect(self):
+        """Ouvre la connexion, le channel et déclare l'exchange"""
+        self._connection = pika.BlockingConnection(pika.ConnectionParameters(self.host))
+        self._channel = self._connection.channel()
+        self._channel.exchange_declare(exchange=self.exchange, exchange_type='topic', durable=True)
+        if self.confirms:
+            self._channel.confirm_delivery()
+        if self._connected and self._pid == os.getpid():
+            track_reconnect('publisher')
+        self._pid = os.getpid()
+        self._connected = True
+
+    def _ensure_channel(self):
+        # Après un fork la connexion appartient au processus parent : on l'abandonne
+        if self._pid != os.getpid():
+            self._connection = None
+            self._channel = None
+        if self._channel is None or not self._channel.is_open:
+            self._reset()
+            self._connect()
+        return self._channel
+
+    def _reset(self):
+        """Ferme silencieusement la connexion courante"""
+        connection = self._connection
+        self._connection = None
+        self._channel = None
+        if connection is not None and self._pid == os.getpid():
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _publish_locked(self, routing_key, message):
+        if isinstance(message, (str, bytes)):
+            body, properties = message, None
+        else:
+            body = json.dumps(message)
+            properties = pika.BasicProperties(
+                content_type='application/json',
+                message_id=message.get('message_id')
+            )
+        started = time.perf_counter()
+        try:
+            try:
+                channel = self._ensure_channel()
+                channel.basic_publish(exchange=self.exchange, routing_key=routing_key, body=body, properties=properties)
+            except AMQPError:
+                # Connexion expirée (heartbeat, redémarrage du broker...) : un seul nouvel essai
+                self._reset()
+                channel = self._ensure_channel()
+                channel.basic_publish(exchange=self.exchange, routing_key=routing_key, body=body, properties=properties)
+        except Exception:
+            track_publish(self.exchange, routing_key, time.perf_counter() - started, success=False)
+            raise
+        track_publish(self.exchange, routing_key, time.perf_counter() - started)
+
+    def publish(self, routing_key, message):
+        """Publie un message (dict ou corps déjà sérialisé) sur l'exchange"""
+        with self._lock:
+            self._publish_locked(routing_key, message)
+
+    def publish_batch(self, messages):
+        """Publie une liste de couples (routing_key, message) en une seule prise du verrou"""
+        with self._lock:
+            for routing_key, message in messages:
+                self._publish_locked(routing_key, message)
+
+    def close(self):
+        """Ferme la connexion du publisher"""
+        with self._lock:
+            self._reset()
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    """Retourne le publisher partagé du processus courant"""
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = RabbitMQPublisher()
+    return _publisher
+
+
+def reset_publisher():
+    """Ferme et oublie le publisher partagé (tests, changement de configuration)"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is not None:
+            _publisher.close()
+        _publisher = None
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+
+import pika
+from pika.exceptions import AMQPError, ChannelClosedByBroker
+from django.conf import settings
+
+from .consumer import CONSUMED_QUEUES
+from .middleware import rabbitmq_queue_consumers, rabbitmq_queue_lag_seconds, rabbitmq_queue_size, track_reconnect
+
+
+class QueueSampler:
+    """Relève périodiquement la profondeur des queues consommées, hors du chemin des requêtes.
+
+    Un thread garde une connexion ouverte et interroge chaque queue (declare
+    passif) toutes les ``interval`` secondes ; les gauges Prometheus et
+    ``snapshot()`` ne servent que la dernière mesure, sans jamais attendre le broker.
+    Le retard (lag) est le temps écoulé depuis que la queue a été vue vide pour la
+    dernière fois : il croît tant que les consumers ne rattrapent pas le flux.
+    """
+
+    def __init__(self, host=None, queues=CONSUMED_QUEUES, interval=None):
+        self.host = host or settings.RABBITMQ_HOST
+        self.queues = tuple(queues)
+        self.interval = interval or settings.RABBITMQ_QUEUE_SAMPLE_INTERVAL
+        self._connection = None
+        self._channel = None
+        self._last_empty = {}
+        self._snapshot = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _ensure_channel(self):
+        if self._connection is None or not self._connection.is_open:
+            self._connection = pika.BlockingConnection(pika.ConnectionParameters(self.host))
+            self._channel = None
+        if self._channel is None or not self._channel.is_open:
+            self._channel = self._connection.channel()
+        return self._channel
+
+    def _reset(self):
+        connection = self._connection
+        self._connection = None
+        self._channel = None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def sample_once(self):
+        """Interroge chaque queue et met à jour les gauges ; renvoie la mesure"""
+        now = time.monotonic()
+        snapshot = {}
+        for queue in self.queues:
+            try:
+                method = self._ensure_channel().queue_declare(queue=queue, passive=True).method
+            except ChannelClosedByBroker as e:
+                # Queue pas encore déclarée par un consumer : le broker ferme le channel
+                print(f"⚠️ Queue {queue} indisponible : {e}")
+                self._channel = None
+                continue
+
+            if method.message_count == 0 or queue not in self._last_empty:
+                self._last_empty[queue] = now
+            lag = 0.0 if method.message_count == 0 else now - self._last_empty[queue]
+            snapshot[queue] = {
+                'messages': method.message_count,
+                'consumers': method.consumer_count,
+                'lag_seconds': lag
+            }
+            rabbitmq_queue_size.labels(queue=queue).set(method.message_count)
+            rabbitmq_queue_consumers.labels(queue=queue).set(method.consumer_count)
+            rabbitmq_queue_lag_seconds.labels(queue=queue).set(lag)
+
+        self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self):
+        """Dernière mesure : {queue: {'messages', 'consumers', 'lag_seconds'}}"""
+        return dict(self._snapshot)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample_once()
+            except AMQPError as e:
+                print(f"❌ Erreur RabbitMQ (queue sampler) : {e}")
+                self._reset()
+                track_reconnect('queue_sampler')
+            except Exception as e:
+                print(f"❌ Erreur du queue sampler : {e}")
+            self._stop.wait(self.interval)
+        self._reset()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='queue-sampler')
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+_sampler = None
+_sampler_pid = None
+_sampler_lock = threading.Lock()
+
+
+def get_queue_sampler():
+    """Retourne le sampler du processus courant (sans le démarrer)"""
+    global _sampler, _sampler_pid
+    if _sampler is None or _sampler_pid != os.getpid():
+        with _sampler_lock:
+            if _sampler is None or _sampler_pid != os.getpid():
+                _sampler = QueueSampler()
+                _sampler_pid = os.getpid()
+    return _sampler
+
+
+def start_queue_sampler():
+    """Démarre le thread de mesure des queues"""
+    get_queue_sampler().start()
+    print("📏 Queue sampler démarré pour le service Product")
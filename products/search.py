@@ -0,0 +1,134 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Product
+
+FTS_TABLE = 'products_product_fts'
+
+# Triggers qui tiennent l'index à jour (mêmes définitions que la migration 0008)
+FTS_TRIGGERS = {
+    'products_product_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS products_product_fts_insert AFTER INSERT ON products_product BEGIN
+            INSERT INTO products_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    """,
+    'products_product_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS products_product_fts_delete AFTER DELETE ON products_product BEGIN
+            INSERT INTO products_product_fts(products_product_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    """,
+    'products_product_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS products_product_fts_update AFTER UPDATE OF name, description
+        ON products_product BEGIN
+            INSERT INTO products_product_fts(products_product_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO products_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    """,
+}
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    """Découpe la saisie en mots (la ponctuation et la syntaxe FTS5 sont ignorées)"""
+    return _TERM.findall(query)
+
+
+_fts_available = {}
+
+
+def fts_available(using='default'):
+    """Vrai si l'index FTS5 existe (vérifié une fois par processus et par base)"""
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[using]
+
+
+def ensure_fts_triggers(using='default'):
+    """Recrée les triggers FTS5 manquants puis reconstruit l'index ; renvoie les noms recréés.
+
+    Quand le schema editor de SQLite reconstruit products_product (AlterField...),
+    les triggers de la table disparaissent sans erreur et l'index ne suit plus les écritures.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'products_product'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in FTS_TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(FTS_TRIGGERS[name])
+        if missing:
+            # Les écritures faites sans trigger ne sont pas dans l'index
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            print(f"🔎 Triggers FTS5 recréés : {', '.join(missing)}")
+    return missing
+
+
+def restore_fts_triggers(sender, using='default', **kwargs):
+    """Receiver post_migrate : remet les triggers FTS5 après chaque migrate"""
+    ensure_fts_triggers(using)
+
+
+def _match_expression(terms):
+    # Chaque mot est cité (pas d'injection de syntaxe FTS5) et cherché en préfixe
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+class RankedSearchResults:
+    """Résultats FTS5 triés par pertinence (bm25), découpables comme un queryset.
+
+    Seuls les ids de la page demandée sont lus dans l'index, puis les produits
+    correspondants sont chargés en une requête ; le nom pèse plus que la description.
+    """
+
+    def __init__(self, terms, using='default'):
+        self.match = _match_expression(terms)
+        self.using = using
+
+    def count(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        offset = index.start or 0
+        limit = -1 if index.stop is None else max(index.stop - offset, 0)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s OFFSET %s",
+                [self.match, limit, offset]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        products = Product.objects.using(self.using).in_bulk(ids)
+        return [products[product_id] for product_id in ids if product_id in products]
+
+
+def scan_products(terms):
+    """Recherche sans index (icontains), pour les bases sans FTS5 : tous les mots doivent apparaître"""
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+    return Product.objects.filter(condition).order_by('id')
+
+
+def find_products(query, using='default'):
+    """Produits correspondant à ``query`` : classés par FTS5 si disponible, sinon par scan"""
+    terms = search_terms(query)
+    if fts_available(using):
+        return RankedSearchResults(terms, using)
+    return scan_products(terms)
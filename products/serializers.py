@@ -1,4 +1,9 @@
+import datetime
+import decimal
+
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import Product
 # from .service_product import publish_products
 class ProductSerializer(serializers.ModelSerializer):
@@ -6,4 +11,78 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = '__all__'
 
+    def update(self, instance, validated_data):
+        """N'écrit que les champs reçus pour ne pas écraser une modification concurrente"""
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        return instance
+
+
+def product_fields():
+    """Champs de ProductSerializer, dans l'ordre de sa sortie"""
+    return tuple(ProductSerializer().fields)
+
+
+def _decimal_converter(field):
+    if (not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            or field.localize or field.normalize_output or field.decimal_places is None):
+        return field.to_representation
+    exponent = -field.decimal_places
+
+    def convert(value):
+        # Valeur lue en base déjà à la bonne précision : pas de quantize
+        if isinstance(value, decimal.Decimal) and value.as_tuple().exponent == exponent:
+            return format(value, 'f')
+        return field.to_representation(value)
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != 'iso-8601' or field_timezone is None \
+            or field_timezone.utcoffset(None) != datetime.timedelta(0) or timezone.get_current_timezone_name() != 'UTC':
+        return field.to_representation
+
+    def convert(value):
+        # Datetime UTC lu en base, rendu en UTC : isoformat direct
+        if isinstance(value, datetime.datetime) and value.tzinfo is datetime.timezone.utc:
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return field.to_representation(value)
+    return convert
+
+
+def _identity_converter(field, expected_type):
+    def convert(value):
+        return value if type(value) is expected_type else field.to_representation(value)
+    return convert
+
+
+def _converter(field):
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.IntegerField):
+        return _identity_converter(field, int)
+    if isinstance(field, serializers.CharField):
+        return _identity_converter(field, str)
+    return field.to_representation
+
+
+def serialize_product_rows(rows):
+    """Sérialise des lignes ``values(*product_fields())`` comme ProductSerializer, sans instancier de modèle.
+
+    Les convertisseurs sont choisis une fois par appel d'après les champs du
+    serializer ; la sortie est identique à ``ProductSerializer(many=True).data``.
+    """
+    converters = [(name, _converter(field)) for name, field in ProductSerializer().fields.items()]
+    return [
+        {name: None if row[name] is None else convert(row[name]) for name, convert in converters}
+        for row in rows
+    ]
+
 # publish_products()
\ No newline at end of file
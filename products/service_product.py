@@ -1,33 +1,68 @@
 import json
-import pika
 import threading
 import time
+import uuid
+from functools import partial
 from django.conf import settings
-from .models import Product
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .cache import invalidate_products
+from .consumer import ORDER_QUEUE, STOCK_QUEUE, run_handler
+from .dedup import get_deduplicator
+from .dispatcher import get_dispatcher
+from .models import InsufficientStock, Product
+from .outbox import write_outbox_event
+from .transport import get_transport
+
+
+EVENT_SOURCE = 'product'
+
+
+def _send(routing_key, message):
+    try:
+        if settings.EVENT_DISPATCH_MODE == 'background':
+            get_dispatcher().enqueue(routing_key, message)
+        else:
+            get_transport().publish(routing_key, message)
+    except Exception as e:
+        print(f"❌ Failed to publish {routing_key}: {e}")
+
+
+def _emit(routing_key, message):
+    """Publie l'événement directement, via le dispatcher d'arrière-plan ou l'outbox"""
+    # Identifiant unique : permet aux consumers d'écarter les doublons et redélivraisons
+    message.setdefault('message_id', uuid.uuid4().hex)
+    message.setdefault('source', EVENT_SOURCE)
+    if settings.EVENT_DISPATCH_MODE == 'outbox':
+        write_outbox_event(routing_key, message)
+    else:
+        # Hors outbox, rien ne part avant le commit : ni événement pour une ligne annulée,
+        # ni appel au broker pendant que la transaction garde le verrou d'écriture
+        transaction.on_commit(partial(_send, routing_key, message))
+
+
+def _product_payload(product_data):
+    return {
+        'product_id': product_data['id'],
+        'name': product_data['name'],
+        'price': float(product_data['price']),
+        'stock': product_data['stock'],
+        'version': product_data.get('version'),
+    }
 
 
 def publish_product_created(product_data):
     """Publie un événement de création de produit"""
     try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters('rabbitmq'))
-        channel = connection.channel()
-        channel.exchange_declare(exchange='service_exchange', exchange_type='topic', durable=True)
-
-        message = {
-            'product_id': product_data['id'],
-            'name': product_data['name'],
-            'price': float(product_data['price']),
-            'stock': product_data['stock'],
-            'timestamp': time.time()
-        }
+        message = _product_payload(product_data)
+        message['timestamp'] = time.time()
 
-        channel.basic_publish(
-            exchange='service_exchange',
-            routing_key='product.created',
-            body=json.dumps(message)
-        )
+        _emit('product.created', message)
         print(f"📤 Published product.created: {message}")
-        connection.close()
+    except DatabaseError:
+        # Mode outbox : l'échec d'écriture doit annuler la transaction du produit
+        raise
     except Exception as e:
         print(f"❌ Failed to publish product.created: {e}")
 
@@ -35,62 +70,264 @@ def publish_product_created(product_data):
 def publish_product_updated(product_data):
     """Publie un événement de mise à jour de produit"""
     try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters('rabbitmq'))
-        channel = connection.channel()
-        channel.exchange_declare(exchange='service_exchange', exchange_type='topic', durable=True)
-
-        message = {
-            'product_id': product_data['id'],
-            'name': product_data['name'],
-            'price': float(product_data['price']),
-            'stock': product_data['stock'],
-            'timestamp': time.time()
-        }
+        message = _product_payload(product_data)
+        message['timestamp'] = time.time()
 
-        channel.basic_publish(
-            exchange='service_exchange',
-            routing_key='product.updated',
-            body=json.dumps(message)
-        )
+        _emit('product.updated', message)
         print(f"📤 Published product.updated: {message}")
-        connection.close()
+    except DatabaseError:
+        # Mode outbox : l'échec d'écriture doit annuler la transaction du produit
+        raise
     except Exception as e:
         print(f"❌ Failed to publish product.updated: {e}")
 
 
-def publish_stock_updated(product_id, new_stock):
+def publish_stock_updated(product_id, new_stock, version=None):
     """Publie un événement de mise à jour de stock"""
     try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters('rabbitmq'))
-        channel = connection.channel()
-        channel.exchange_declare(exchange='service_exchange', exchange_type='topic', durable=True)
-
         message = {
             'product_id': product_id,
             'new_stock': new_stock,
             'timestamp': time.time()
         }
+        if version is not None:
+            message['version'] = version
 
-        channel.basic_publish(
-            exchange='service_exchange',
-            routing_key='stock.updated',
-            body=json.dumps(message)
-        )
+        _emit('stock.updated', message)
         print(f"📤 Published stock.updated: {message}")
-        connection.close()
+    except DatabaseError:
+        # Mode outbox : l'échec d'écriture doit annuler la transaction du produit
+        raise
     except Exception as e:
         print(f"❌ Failed to publish stock.updated: {e}")
 
 
+def publish_products_batch(routing_key, products_data):
+    """Publie des événements produit groupés (product.created / product.updated) par lots"""
+    chunk_size = settings.EVENT_BATCH_CHUNK_SIZE
+    try:
+        for start in range(0, len(products_data), chunk_size):
+            message = {
+                'products': [_product_payload(data) for data in products_data[start:start + chunk_size]],
+                'timestamp': time.time()
+            }
+            _emit(routing_key, message)
+        print(f"📤 Published {len(products_data)} products as batched {routing_key}")
+    except DatabaseError:
+        raise
+    except Exception as e:
+        print(f"❌ Failed to publish batched {routing_key}: {e}")
+
+
+def publish_stock_updated_batch(stock_changes):
+    """Publie un seul événement stock.updated pour une liste de (product_id, new_stock, version)"""
+    try:
+        message = {
+            'items': [
+                {'product_id': product_id, 'new_stock': new_stock, 'version': version}
+                for product_id, new_stock, version in stock_changes
+            ],
+            'timestamp': time.time()
+        }
+
+        _emit('stock.updated', message)
+        print(f"📤 Published batched stock.updated: {len(stock_changes)} products")
+    except DatabaseError:
+        raise
+    except Exception as e:
+        print(f"❌ Failed to publish batched stock.updated: {e}")
+
+
+def publish_order_rejected(order_id, reason, failures, detail=None):
+    """Publie le rejet d'une commande qui ne peut pas être servie"""
+    try:
+        message = {
+            'order_id': order_id,
+            'reason': reason,
+            'failures': failures,
+            'timestamp': time.time()
+        }
+        if detail:
+            message['detail'] = detail
+
+        _emit('order.rejected', message)
+        print(f"📤 Published order.rejected: {message}")
+    except DatabaseError:
+        raise
+    except Exception as e:
+        print(f"❌ Failed to publish order.rejected: {e}")
+
+
+def _parse_order(message):
+    """Retourne (order_id, {product_id: quantité}) ou lève ValueError si la commande est invalide"""
+    order_id = message.get('order_id')
+    lines = message.get('products')
+    if order_id is None or not isinstance(lines, list) or not lines:
+        raise ValueError('Commande sans order_id ou sans produits')
+
+    quantities = {}
+    for line in lines:
+        product_id = line.get('product_id') if isinstance(line, dict) else None
+        quantity = line.get('quantity') if isinstance(line, dict) else None
+        if not isinstance(product_id, int) or not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError(f'Ligne de commande invalide : {line}')
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return order_id, quantities
+
+
+def _allocate_orders(orders, stocks):
+    """Sert les commandes dans leur ordre d'arrivée sur un instantané des stocks.
+
+    Retourne (quantités totales par produit, commandes rejetées avec leurs motifs).
+    """
+    remaining = dict(stocks)
+    totals = {}
+    rejected = []
+    for order_id, quantities in orders:
+        failures = []
+        for product_id, quantity in quantities.items():
+            if product_id not in remaining:
+                failures.append({'product_id': product_id, 'reason': 'not_found'})
+            elif remaining[product_id] < quantity:
+                failures.append({'product_id': product_id, 'reason': 'insufficient_stock'})
+        if failures:
+            rejected.append((order_id, failures))
+            continue
+        for product_id, quantity in quantities.items():
+            remaining[product_id] -= quantity
+            totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals, rejected
+
+
+def _order_key(message):
+    """Clé de déduplication d'une commande : message_id, sinon order_id"""
+    if not isinstance(message, dict):
+        return None
+    if message.get('message_id'):
+        return message['message_id']
+    if message.get('order_id') is not None:
+        return f"order:{message['order_id']}"
+    return None
+
+
+def handle_order_created_batch(messages, retries=3):
+    """Décrémente le stock pour un lot d'événements order.created.
+
+    Les quantités des commandes acceptées sont sommées par produit et appliquées en
+    un UPDATE conditionnel par produit ; un lot coûte une lecture groupée des stocks
+    plus une écriture par produit distinct, quel que soit le nombre de lignes.
+    Les commandes impossibles à servir sont rejetées par un événement order.rejected.
+    Une commande déjà traitée (redélivraison, doublon) est ignorée.
+    """
+    deduplicator = get_deduplicator()
+    messages = deduplicator.filter_new(messages, key=_order_key)
+    processed_keys = [key for key in map(_order_key, messages) if key is not None]
+
+    orders = []
+    invalid = []
+    for message in messages:
+        print(f"📥 Order created event received: {message}")
+        try:
+            orders.append(_parse_order(message))
+        except (AttributeError, ValueError) as e:
+            invalid.append((message.get('order_id') if isinstance(message, dict) else None, str(e)))
+
+    product_ids = {product_id for _, quantities in orders for product_id in quantities}
+    for attempt in range(retries):
+        try:
+            with transaction.atomic():
+                stocks = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'stock'))
+                totals, rejected = _allocate_orders(orders, stocks)
+                levels = {
+                    product_id: Product.objects.adjust_stock(product_id, -quantity)
+                    for product_id, quantity in sorted(totals.items())
+                }
+
+                invalidate_products(levels)
+                if levels:
+                    publish_stock_updated_batch([
+                        (product_id, level.stock, level.version) for product_id, level in levels.items()
+                    ])
+                for order_id, failures in rejected:
+                    publish_order_rejected(order_id, 'stock_unavailable', failures)
+                for order_id, reason in invalid:
+                    publish_order_rejected(order_id, 'invalid_order', [], detail=reason)
+                deduplicator.persist_processed(processed_keys)
+            break
+        except InsufficientStock:
+            # Stock modifié entre la lecture et l'écriture : on relit et on recommence
+            if attempt == retries - 1:
+                raise
+
+    deduplicator.remember_processed(processed_keys)
+    print(f"✅ {len(orders) - len(rejected)} orders applied, {len(rejected) + len(invalid)} rejected")
+
+
+def handle_stock_updated_batch(messages):
+    """Applique un lot d'événements stock.updated en un seul bulk_update.
+
+    Les messages déjà traités, les versions périmées et les échos des événements
+    publiés par ce service sont écartés sans toucher la base. Seule la valeur la
+    plus récente de chaque produit est conservée : un produit mis à jour dix fois
+    dans le lot n'est écrit qu'une fois.
+    """
+    deduplicator = get_deduplicator()
+    messages = deduplicator.filter_new(messages, key=lambda message: message.get('message_id'))
+
+    latest = {}
+    for message in messages:
+        source = message.get('source')
+        if source == EVENT_SOURCE:
+            # Écho de nos propres écritures (la queue est liée à stock.updated) : déjà
+            # appliquées, et un écho en retard écraserait un stock plus récent
+            continue
+        # Message unitaire ou lot "items"
+        for item in message.get('items') or [message]:
+            product_id = item.get('product_id')
+            new_stock = item.get('new_stock')
+            version = item.get('version')
+            if not product_id or new_stock is None:
+                continue
+            if version is not None and deduplicator.is_stale(source, product_id, version):
+                continue
+            previous = latest.get(product_id)
+            if (previous and version is not None and previous[1] is not None
+                    and previous[2] == source and version < previous[1]):
+                continue
+            latest[product_id] = (new_stock, version, source)
+
+    processed_keys = [message['message_id'] for message in messages if message.get('message_id')]
+    if not latest:
+        deduplicator.remember_processed(processed_keys)
+        return
+
+    with transaction.atomic():
+        current_stocks = dict(Product.objects.filter(id__in=latest).values_list('id', 'stock'))
+        now = timezone.now()
+        changed = [
+            Product(id=product_id, stock=new_stock, version=F('version') + 1, updated_at=now)
+            for product_id, (new_stock, _, _) in latest.items()
+            if product_id in current_stocks and current_stocks[product_id] != new_stock
+        ]
+        Product.objects.bulk_update(changed, fields=['stock', 'version', 'updated_at'], batch_size=500)
+        invalidate_products(product.id for product in changed)
+        deduplicator.persist_processed(processed_keys)
+
+    deduplicator.remember_processed(processed_keys)
+    for product_id, (_, version, source) in latest.items():
+        if version is not None:
+            deduplicator.remember_version(source, product_id, version)
+
+    for product_id in latest.keys() - current_stocks.keys():
+        print(f"⚠️ Product {product_id} not found for stock sync")
+    if changed:
+        print(f"✅ Stock synchronized for {len(changed)} products")
+
+
 def callback_order_created(ch, method, properties, body):
     """Callback pour les événements de création de commande"""
     try:
-        message = json.loads(body)
-        print(f"📥 Order created event received: {message}")
-        
-        # Ici on pourrait ajouter de la logique métier
-        # Par exemple, vérifier les stocks, envoyer des alertes, etc.
-        
+        run_handler(handle_order_created_batch, [json.loads(body)], ORDER_QUEUE, 'order.created')
     except Exception as e:
         print(f"❌ Error processing order.created event: {e}")
 
@@ -100,70 +337,17 @@ def callback_stock_updated(ch, method, properties, body):
     try:
         message = json.loads(body)
         print(f"📥 Stock updated event received: {message}")
-        
-        # Synchronisation du stock si nécessaire
-        product_id = message.get('product_id')
-        new_stock = message.get('new_stock')
-        
-        if product_id and new_stock is not None:
-            try:
-                product = Product.objects.get(id=product_id)
-                if product.stock != new_stock:
-                    product.stock = new_stock
-                    product.save()
-                    print(f"✅ Stock synchronized for product {product_id}: {new_stock}")
-            except Product.DoesNotExist:
-                print(f"⚠️ Product {product_id} not found for stock sync")
-        
+        run_handler(handle_stock_updated_batch, [message], STOCK_QUEUE, 'stock.updated')
     except Exception as e:
         print(f"❌ Error processing stock.updated event: {e}")
 
 
-def consume_events():
-    """Consomme les événements RabbitMQ"""
-    while True:
-        try:
-            connection = pika.BlockingConnection(pika.ConnectionParameters('rabbitmq'))
-            channel = connection.channel()
-            
-            # Déclaration de l'exchange
-            channel.exchange_declare(exchange='service_exchange', exchange_type='topic', durable=True)
-            
-            # Déclaration de la queue pour les événements de commande
-            channel.queue_declare(queue='product_service_order_queue', durable=True)
-            channel.queue_bind(
-                exchange='service_exchange', 
-                queue='product_service_order_queue', 
-                routing_key='order.created'
-            )
-            
-            # Déclaration de la queue pour les événements de stock
-            channel.queue_declare(queue='product_service_stock_queue', durable=True)
-            channel.queue_bind(
-                exchange='service_exchange', 
-                queue='product_service_stock_queue', 
-                routing_key='stock.updated'
-            )
-            
-            # Configuration des callbacks
-            channel.basic_consume(
-                queue='product_service_order_queue', 
-                on_message_callback=callback_order_created, 
-                auto_ack=True
-            )
-            
-            channel.basic_consume(
-                queue='product_service_stock_queue', 
-                on_message_callback=callback_stock_updated, 
-                auto_ack=True
-            )
-            
-            print("👂 Product service écoute les événements...")
-            channel.start_consuming()
-            
-        except Exception as e:
-            print(f"❌ Erreur RabbitMQ (consume_events) : {e}")
-            time.sleep(5)
+def consume_events(prefetch_count=None, batch_size=None):
+    """Consomme les événements par lots via le transport configuré (EVENT_TRANSPORT)"""
+    get_transport().consume([
+        (ORDER_QUEUE, 'order.created', handle_order_created_batch),
+        (STOCK_QUEUE, 'stock.updated', handle_stock_updated_batch),
+    ], prefetch_count=prefetch_count, batch_size=batch_size)
 
 
 def start_consumer_thread():
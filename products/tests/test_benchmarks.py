@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from products.benchmarks import BenchmarkSuite, compare_to_baseline, percentile, seed_products, summarize
+from products.dedup import reset_deduplicator
+from products.models import Product
+
+
+class BenchmarkStatisticsTest(TestCase):
+    def test_percentile_nearest_rank(self):
+        """Test du percentile au rang le plus proche"""
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentile(values, 0.50), 0.050)
+        self.assertEqual(percentile(values, 0.95), 0.095)
+        self.assertEqual(percentile(values, 0.99), 0.099)
+        self.assertEqual(percentile([], 0.99), 0.0)
+
+    def test_summarize_reports_milliseconds(self):
+        """Test du résumé : débit par seconde et latences en millisecondes"""
+        summary = summarize([0.001, 0.002, 0.003, 0.004], elapsed=0.01)
+        self.assertEqual(summary['count'], 4)
+        self.assertEqual(summary['throughput_per_s'], 400.0)
+        self.assertEqual(summary['p50_ms'], 2.0)
+        self.assertEqual(summary['p99_ms'], 4.0)
+
+    def test_compare_flags_p95_regressions(self):
+        """Test de la comparaison à la baseline : seul un p95 au-delà de la tolérance est signalé"""
+        baseline = {'scenarios': {'detail': {'p95_ms': 2.0}, 'list_page': {'p95_ms': 10.0}}}
+        report = {'scenarios': {
+            'detail': {'p95_ms': 3.0}, 'list_page': {'p95_ms': 11.0}, 'publish': {'p95_ms': 0.1}
+        }}
+
+        comparison = compare_to_baseline(report, baseline, tolerance=0.2)
+
+        self.assertEqual(comparison['detail'], (2.0, 3.0, 1.5, True))
+        self.assertFalse(comparison['list_page'][3])
+        self.assertNotIn('publish', comparison)
+
+
+class BenchmarkSuiteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_deduplicator()
+        seed_products(50)
+
+    def test_run_covers_http_and_event_paths(self):
+        """Test d'une exécution réduite : chaque scénario mesuré, sans broker réel"""
+        report = BenchmarkSuite(requests=3, warmup=1).run()
+
+        self.assertEqual(report['meta']['products'], 50)
+        self.assertEqual(set(report['scenarios']), {
+            'list_page', 'list_filtered', 'detail', 'stock_read', 'stock_update', 'stock_increment',
+            'low_stock', 'list_page_cached', 'publish', 'consume', 'inprocess_roundtrip'
+        })
+        self.assertEqual(report['scenarios']['detail']['count'], 3)
+        self.assertEqual(report['scenarios']['consume']['count'], 30)
+        self.assertEqual(Product.objects.count(), 50)
+
+    def test_run_selected_scenarios(self):
+        """Test de la sélection de scénarios"""
+        report = BenchmarkSuite(requests=2, warmup=0).run(['stock_read', 'publish'])
+        self.assertEqual(set(report['scenarios']), {'stock_read', 'publish'})
@@ -0,0 +1,204 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from products.cache import (
+    CATALOG_VERSION_KEY, CountingLocMemCache, cache_catalog_response, cached_catalog_response, get_catalog_version
+)
+from products.dedup import reset_deduplicator
+from products.middleware import product_cache_evictions_total, product_cache_requests_total
+from products.models import Product
+from products.service_product import handle_stock_updated_batch
+
+
+def counter_value(counter, **labels):
+    return counter.labels(**labels)._value.get()
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class ProductCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset_deduplicator()
+        self.product = Product.objects.create(
+            name='Test Product', description='Test Description', price=Decimal('19.99'), stock=10
+        )
+        self.stock_url = reverse('product-stock', kwargs={'product_id': self.product.id})
+        self.detail_url = reverse('product-detail', kwargs={'pk': self.product.id})
+
+    def test_stock_lookup_is_served_from_cache(self):
+        """Test d'une lecture de stock répétée : une seule requête SQL"""
+        hits = counter_value(product_cache_requests_total, cache='stock', result='hit')
+        self.client.get(self.stock_url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.stock_url)
+
+        self.assertEqual(response.data['stock'], 10)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(counter_value(product_cache_requests_total, cache='stock', result='hit'), hits + 1)
+
+    def test_detail_is_served_from_cache(self):
+        """Test d'une lecture de détail répétée : une seule requête SQL"""
+        first = self.client.get(self.detail_url)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.detail_url)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(len(queries), 0)
+
+    def test_missing_product_is_not_cached(self):
+        """Test d'un produit inexistant : 404 sans mise en cache"""
+        url = reverse('product-stock', kwargs={'product_id': 999})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIsNone(cache.get('product:stock:999'))
+
+    def test_write_paths_invalidate(self):
+        """Test de l'invalidation par les vues d'écriture"""
+        self.client.get(self.stock_url)
+        self.client.get(self.detail_url)
+
+        self.client.post(
+            reverse('decrement-product-stock', kwargs={'product_id': self.product.id}),
+            {'quantity': 3}, format='json'
+        )
+        self.assertEqual(self.client.get(self.stock_url).data['stock'], 7)
+        self.assertEqual(self.client.get(self.detail_url).data['stock'], 7)
+
+        self.client.patch(self.detail_url, {'name': 'Renamed'}, format='json')
+        self.assertEqual(self.client.get(self.stock_url).data['name'], 'Renamed')
+
+    def test_consumed_stock_update_invalidates(self):
+        """Test de l'invalidation par un événement stock.updated d'un autre service"""
+        self.client.get(self.stock_url)
+
+        handle_stock_updated_batch([{'product_id': self.product.id, 'new_stock': 42}])
+
+        self.assertEqual(self.client.get(self.stock_url).data['stock'], 42)
+
+    def test_culled_entries_are_counted(self):
+        """Test du compteur d'éviction quand le cache est plein"""
+        small = CountingLocMemCache('cache-test', {'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 2}})
+        culled = counter_value(product_cache_evictions_total, reason='culled')
+
+        for i in range(3):
+            small.set(f'k{i}', i)
+
+        self.assertEqual(counter_value(product_cache_evictions_total, reason='culled'), culled + 1)
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class CatalogResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset_deduplicator()
+        self.product = Product.objects.create(
+            name='Test Product', description='Test Description', price=Decimal('19.99'), stock=3
+        )
+        self.list_url = reverse('product-list-create')
+        self.low_stock_url = reverse('low-stock-products')
+
+    def test_repeated_list_is_served_without_queries(self):
+        """Test d'une liste relue : corps rendu servi depuis le cache, sans ORM"""
+        first = self.client.get(self.list_url, {'ordering': 'name'})
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.list_url, {'ordering': 'name'})
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_query_params_and_accept_are_separate_entries(self):
+        """Test des variantes : paramètres et en-tête Accept font partie de la clé"""
+        self.client.get(self.list_url)
+        filtered = self.client.get(self.list_url, {'min_stock': 5})
+        browsable = self.client.get(self.list_url, HTTP_ACCEPT='text/html')
+
+        self.assertEqual(filtered.json(), [])
+        self.assertTrue(browsable['Content-Type'].startswith('text/html'))
+
+    def test_host_and_scheme_are_part_of_the_key(self):
+        """Test des liens next absolus : une entrée par hôte et par schéma"""
+        Product.objects.create(name='Other', description='D', price=Decimal('1.00'), stock=1)
+
+        internal = self.client.get(self.list_url, {'page_size': 1}, HTTP_HOST='product')
+        public = self.client.get(self.list_url, {'page_size': 1}, HTTP_HOST='shop.example.com')
+        secure = self.client.get(self.list_url, {'page_size': 1}, HTTP_HOST='shop.example.com', secure=True)
+
+        self.assertTrue(internal.json()['next'].startswith('http://product/'))
+        self.assertTrue(public.json()['next'].startswith('http://shop.example.com/'))
+        self.assertTrue(secure.json()['next'].startswith('https://shop.example.com/'))
+
+    def test_browsable_and_cookie_dependent_responses_are_not_cached(self):
+        """Test de l'API navigable (HTML, jeton CSRF) et des réponses variant selon le cookie : jamais en cache"""
+        self.client.get(self.list_url, HTTP_ACCEPT='text/html')
+        with CaptureQueriesContext(connection) as queries:
+            browsable = self.client.get(self.list_url, HTTP_ACCEPT='text/html')
+        self.assertTrue(browsable['Content-Type'].startswith('text/html'))
+        self.assertGreater(len(queries), 0)
+
+        request = RequestFactory().get(self.list_url)
+        response = HttpResponse(b'[]', content_type='application/json')
+        response['Vary'] = 'Accept, Cookie'
+        cache_catalog_response(request, response)
+        self.assertIsNone(cached_catalog_response(request))
+
+    def test_low_stock_is_cached_and_invalidated_by_writes(self):
+        """Test du cache low-stock : invalidé par une écriture via l'API"""
+        self.assertEqual(self.client.get(self.low_stock_url).data['count'], 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.low_stock_url)
+        self.assertEqual(len(queries), 0)
+
+        self.client.post(
+            reverse('increment-product-stock', kwargs={'product_id': self.product.id}),
+            {'quantity': 20}, format='json'
+        )
+
+        self.assertEqual(self.client.get(self.low_stock_url).json()['count'], 0)
+
+    def test_set_stock_invalidates_stock_list_and_low_stock(self):
+        """Test de PATCH /stock/update/ : stock, liste, low-stock et ETag de la liste rafraîchis"""
+        stock_url = reverse('product-stock', kwargs={'product_id': self.product.id})
+        self.client.get(stock_url)
+        etag = self.client.get(self.list_url)['ETag']
+        self.assertEqual(self.client.get(self.low_stock_url).data['count'], 1)
+
+        self.client.patch(
+            reverse('update-product-stock', kwargs={'product_id': self.product.id}), {'stock': 30}, format='json'
+        )
+
+        self.assertEqual(self.client.get(stock_url).data['stock'], 30)
+        self.assertEqual(self.client.get(self.list_url).json()[0]['stock'], 30)
+        self.assertEqual(self.client.get(self.low_stock_url).json()['count'], 0)
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_creation_and_consumer_bump_catalog_version(self):
+        """Test de l'incrément de version par une création et par le consumer"""
+        self.client.get(self.list_url)
+        self.client.post(
+            self.list_url, {'name': 'New', 'description': 'D', 'price': '1.00', 'stock': 1}, format='json'
+        )
+        self.assertEqual(len(self.client.get(self.list_url).json()), 2)
+
+        handle_stock_updated_batch([{'product_id': self.product.id, 'new_stock': 8}])
+
+        stocks = {product['id']: product['stock'] for product in self.client.get(self.list_url).json()}
+        self.assertEqual(stocks[self.product.id], 8)
+
+    def test_version_survives_eviction(self):
+        """Test d'une clé de version évincée : la version repart plus haut, jamais en arrière"""
+        version = get_catalog_version()
+        cache.delete(CATALOG_VERSION_KEY)
+
+        self.assertGreater(get_catalog_version(), version)
@@ -0,0 +1,332 @@
+import json
+import os
+import sys
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from products.consumer import QueueBuffer
+from products.dedup import EventDeduplicator, reset_deduplicator
+from products.models import OutboxEvent, ProcessedEvent, Product
+from products.service_product import handle_order_created_batch, handle_stock_updated_batch
+
+
+def delivery(tag, message, redelivered=False):
+    method = MagicMock(delivery_tag=tag, redelivered=redelivered)
+    body = message if isinstance(message, bytes) else json.dumps(message).encode('utf-8')
+    return method, MagicMock(), body
+
+
+class QueueBufferTest(TestCase):
+    def setUp(self):
+        self.channel = MagicMock()
+        self.handler = MagicMock()
+        self.buffer = QueueBuffer(self.channel, 'test_queue', self.handler, batch_size=3, batch_window=60)
+
+    def test_batch_is_flushed_when_full_and_acked_once(self):
+        """Test du traitement d'un lot complet et de l'ack multiple"""
+        for tag in (1, 2):
+            self.buffer.append(self.channel, *delivery(tag, {'n': tag}))
+        self.handler.assert_not_called()
+
+        self.buffer.append(self.channel, *delivery(3, {'n': 3}))
+
+        self.handler.assert_called_once_with([{'n': 1}, {'n': 2}, {'n': 3}])
+        self.channel.basic_ack.assert_called_once_with(delivery_tag=3, multiple=True)
+
+    def test_batch_is_due_after_window(self):
+        """Test de l'échéance d'un lot incomplet"""
+        self.buffer.batch_window = 0
+        self.assertFalse(self.buffer.is_due())
+
+        self.buffer.append(self.channel, *delivery(1, {'n': 1}))
+        self.assertTrue(self.buffer.is_due())
+
+    def test_failed_batch_is_retried_one_by_one(self):
+        """Test d'un lot en échec : reprise message par message"""
+        def handler(messages):
+            if len(messages) > 1 or messages[0]['n'] == 2:
+                raise ValueError('boom')
+        self.buffer.handler = handler
+
+        self.buffer.append(self.channel, *delivery(1, {'n': 1}))
+        self.buffer.append(self.channel, *delivery(2, {'n': 2}, redelivered=True))
+        self.buffer.append(self.channel, *delivery(3, {'n': 3}))
+
+        self.assertEqual([c.kwargs['delivery_tag'] for c in self.channel.basic_ack.call_args_list], [1, 3])
+        self.channel.basic_nack.assert_called_once_with(delivery_tag=2, requeue=False)
+
+    def test_invalid_json_is_discarded(self):
+        """Test d'un message JSON invalide dans un lot"""
+        self.buffer.append(self.channel, *delivery(1, b'invalid json'))
+        self.buffer.flush()
+
+        self.handler.assert_called_once_with([])
+        self.channel.basic_ack.assert_called_once_with(delivery_tag=1, multiple=True)
+
+
+class HandleStockUpdatedBatchTest(TestCase):
+    def setUp(self):
+        reset_deduplicator()
+        self.products = [
+            Product.objects.create(name=f'P{i}', description='D', price=Decimal('1.00'), stock=10)
+            for i in range(3)
+        ]
+
+    def test_latest_stock_per_product_wins(self):
+        """Test du regroupement par produit : la dernière valeur l'emporte"""
+        p1, p2, p3 = self.products
+        messages = [
+            {'product_id': p1.id, 'new_stock': 1},
+            {'product_id': p1.id, 'new_stock': 2},
+            {'items': [{'product_id': p2.id, 'new_stock': 5}, {'product_id': p1.id, 'new_stock': 3}]},
+            {'product_id': p3.id, 'new_stock': 10},
+            {'product_id': 999, 'new_stock': 1},
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            handle_stock_updated_batch(messages)
+
+        stocks = dict(Product.objects.values_list('id', 'stock'))
+        self.assertEqual((stocks[p1.id], stocks[p2.id], stocks[p3.id]), (3, 5, 10))
+        updates = [query for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+    def test_empty_batch(self):
+        """Test d'un lot sans mise à jour exploitable"""
+        with CaptureQueriesContext(connection) as queries:
+            handle_stock_updated_batch([{'new_stock': 5}, {'product_id': self.products[0].id}])
+
+        self.assertEqual(len(queries), 0)
+
+
+class EventDeduplicationTest(TestCase):
+    def setUp(self):
+        reset_deduplicator()
+        self.product = Product.objects.create(name='P', description='D', price=Decimal('1.00'), stock=10)
+
+    def test_redelivered_message_is_skipped_without_queries(self):
+        """Test d'un message redélivré : écarté sans accès à la base"""
+        message = {'message_id': 'm1', 'source': 'inventory', 'product_id': self.product.id, 'new_stock': 4}
+        handle_stock_updated_batch([message])
+        Product.objects.filter(id=self.product.id).update(stock=10)
+
+        with CaptureQueriesContext(connection) as queries:
+            handle_stock_updated_batch([dict(message)])
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 10)
+
+    def test_stale_version_is_skipped(self):
+        """Test d'un événement plus ancien que la dernière version appliquée"""
+        handle_stock_updated_batch([
+            {'message_id': 'm1', 'source': 'inventory', 'product_id': self.product.id, 'new_stock': 4, 'version': 7}
+        ])
+        handle_stock_updated_batch([
+            {'message_id': 'm2', 'source': 'inventory', 'product_id': self.product.id, 'new_stock': 8, 'version': 6}
+        ])
+
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 4)
+
+    def test_own_echoes_do_not_overwrite_newer_stock(self):
+        """Test des échos de nos propres stock.updated : ignorés, aucune décrémentation perdue"""
+        def decrement(message_id):
+            level = Product.objects.adjust_stock(self.product.id, -2)
+            return {'message_id': message_id, 'source': 'product', 'product_id': self.product.id,
+                    'new_stock': level.stock, 'version': level.version}
+
+        first, second = decrement('e1'), decrement('e2')
+        handle_stock_updated_batch([first])
+        third = decrement('e3')
+        handle_stock_updated_batch([second, third])
+
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 4)
+
+    def test_cache_is_bounded(self):
+        """Test de l'éviction LRU des identifiants les plus anciens"""
+        deduplicator = EventDeduplicator(size=2, persist=False)
+        deduplicator.remember_processed(['a', 'b', 'c'])
+
+        fresh = deduplicator.filter_new([{'id': 'a'}, {'id': 'c'}], key=lambda message: message['id'])
+
+        self.assertEqual(fresh, [{'id': 'a'}])
+
+    @override_settings(EVENT_DEDUP_PERSIST=True)
+    def test_persisted_ids_survive_restart(self):
+        """Test de la déduplication persistée : un nouveau processus écarte aussi le doublon"""
+        message = {'message_id': 'm1', 'product_id': self.product.id, 'new_stock': 4}
+        handle_stock_updated_batch([message])
+        self.assertTrue(ProcessedEvent.objects.filter(message_id='m1').exists())
+
+        reset_deduplicator()
+        Product.objects.filter(id=self.product.id).update(stock=10)
+        handle_stock_updated_batch([dict(message)])
+
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 10)
+
+    def test_persisted_ids_are_purged_after_retention(self):
+        """Test de la purge des ProcessedEvent plus vieux que la rétention, au plus une fois par intervalle"""
+        deduplicator = EventDeduplicator(persist=True, retention=3600)
+        deduplicator.persist_processed(['old'])
+        ProcessedEvent.objects.filter(message_id='old').update(processed_at=timezone.now() - timedelta(hours=2))
+
+        deduplicator.persist_processed(['recent'])
+        self.assertTrue(ProcessedEvent.objects.filter(message_id='old').exists())
+
+        self.assertEqual(deduplicator.purge_processed(), 1)
+        self.assertEqual(list(ProcessedEvent.objects.values_list('message_id', flat=True)), ['recent'])
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class HandleOrderCreatedBatchTest(TestCase):
+    def setUp(self):
+        reset_deduplicator()
+        self.p1 = Product.objects.create(name='P1', description='D', price=Decimal('1.00'), stock=10)
+        self.p2 = Product.objects.create(name='P2', description='D', price=Decimal('1.00'), stock=3)
+
+    def order(self, order_id, *lines):
+        return {
+            'order_id': order_id,
+            'products': [{'product_id': product_id, 'quantity': quantity} for product_id, quantity in lines]
+        }
+
+    def test_orders_are_grouped_per_product(self):
+        """Test du regroupement des quantités : une écriture par produit"""
+        messages = [
+            self.order(1, (self.p1.id, 2), (self.p2.id, 1)),
+            self.order(2, (self.p1.id, 3)),
+            self.order(3, (self.p1.id, 1), (self.p2.id, 2)),
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            handle_order_created_batch(messages)
+
+        stocks = dict(Product.objects.values_list('id', 'stock'))
+        self.assertEqual((stocks[self.p1.id], stocks[self.p2.id]), (4, 0))
+        product_updates = [q for q in queries if q['sql'].startswith('UPDATE "products_product"')]
+        self.assertEqual(len(product_updates), 2)
+
+        event = OutboxEvent.objects.get(routing_key='stock.updated')
+        self.assertEqual(
+            sorted((item['product_id'], item['new_stock']) for item in event.payload['items']),
+            [(self.p1.id, 4), (self.p2.id, 0)]
+        )
+        self.assertFalse(OutboxEvent.objects.filter(routing_key='order.rejected').exists())
+
+    def test_unfulfillable_orders_are_rejected(self):
+        """Test du rejet des commandes impossibles à servir, dans l'ordre d'arrivée"""
+        messages = [
+            self.order(1, (self.p2.id, 2)),
+            self.order(2, (self.p1.id, 1), (self.p2.id, 2)),
+            self.order(3, (999, 1)),
+            {'order_id': 4, 'products': [{'product_id': self.p1.id, 'quantity': -1}]},
+        ]
+
+        handle_order_created_batch(messages)
+
+        stocks = dict(Product.objects.values_list('id', 'stock'))
+        self.assertEqual((stocks[self.p1.id], stocks[self.p2.id]), (10, 1))
+        rejections = {
+            event.payload['order_id']: event.payload
+            for event in OutboxEvent.objects.filter(routing_key='order.rejected')
+        }
+        self.assertEqual(sorted(rejections), [2, 3, 4])
+        self.assertEqual(rejections[2]['failures'], [{'product_id': self.p2.id, 'reason': 'insufficient_stock'}])
+        self.assertEqual(rejections[3]['failures'], [{'product_id': 999, 'reason': 'not_found'}])
+        self.assertEqual(rejections[4]['reason'], 'invalid_order')
+
+
+@patch('products.queue_sampler.start_queue_sampler')
+class ConsumerStartupTest(TestCase):
+    @patch('products.service_product.consume_events')
+    def test_consume_events_command_single_worker(self, mock_consume_events, mock_sampler):
+        """Test de la commande consume_events avec un seul worker"""
+        call_command('consume_events', '--workers', '1', '--prefetch', '50', '--batch-size', '10')
+
+        mock_consume_events.assert_called_once_with(50, 10)
+
+    @patch('prometheus_client.start_http_server')
+    @patch('products.service_product.consume_events')
+    def test_consume_events_command_serves_metrics(self, mock_consume_events, mock_http_server, mock_sampler):
+        """Test de l'exposition des métriques d'un consumer lancé à part"""
+        call_command('consume_events', '--workers', '1', '--metrics-port', '9101')
+
+        mock_http_server.assert_called_once_with(9101)
+        mock_consume_events.assert_called_once()
+
+    @patch('products.service_product.start_consumer_thread')
+    def test_web_process_starts_consumer_thread(self, mock_start, mock_sampler):
+        """Test du démarrage du thread consumer dans un processus web"""
+        with patch.object(sys, 'argv', ['gunicorn']):
+            apps.get_app_config('products').ready()
+
+        mock_start.assert_called_once()
+        mock_sampler.assert_called_once()
+
+    @override_settings(EVENT_CONSUMER_IN_WEB_PROCESS=False)
+    @patch('products.service_product.start_consumer_thread')
+    def test_consumer_thread_can_be_disabled(self, mock_start, mock_sampler):
+        """Test de la désactivation du thread consumer dans les processus web"""
+        with patch.object(sys, 'argv', ['gunicorn']):
+            apps.get_app_config('products').ready()
+
+        mock_start.assert_not_called()
+
+    @patch('products.service_product.start_consumer_thread')
+    def test_management_commands_do_not_start_consumer(self, mock_start, mock_sampler):
+        """Test : migrate et les autres commandes ne démarrent pas le consumer"""
+        with patch.object(sys, 'argv', ['manage.py', 'migrate']):
+            apps.get_app_config('products').ready()
+
+        mock_start.assert_not_called()
+        mock_sampler.assert_not_called()
+
+    @override_settings(EVENT_TRANSPORT='inprocess')
+    @patch('products.service_product.start_consumer_thread')
+    def test_in_process_consumer_runs_in_serving_runserver_process(self, mock_start, mock_sampler):
+        """Test du transport en mémoire sous runserver : consumer dans l'enfant qui sert (RUN_MAIN), pas dans le parent"""
+        with patch.object(sys, 'argv', ['manage.py', 'runserver']), patch.dict(os.environ, {'RUN_MAIN': ''}):
+            apps.get_app_config('products').ready()
+        mock_start.assert_not_called()
+
+        with patch.object(sys, 'argv', ['manage.py', 'runserver']), patch.dict(os.environ, {'RUN_MAIN': 'true'}):
+            apps.get_app_config('products').ready()
+        mock_start.assert_called_once()
+
+        with patch.object(sys, 'argv', ['manage.py', 'runserver', '--noreload']), patch.dict(os.environ, {'RUN_MAIN': ''}):
+            apps.get_app_config('products').ready()
+        self.assertEqual(mock_start.call_count, 2)
+        mock_sampler.assert_not_called()
+
+    @patch('products.service_product.start_consumer_thread')
+    def test_consumer_runs_in_serving_runserver_process(self, mock_start, mock_sampler):
+        """Test du consumer RabbitMQ sous runserver : démarré dans l'enfant qui sert (RUN_MAIN), pas dans le parent"""
+        with patch.object(sys, 'argv', ['manage.py', 'runserver']), patch.dict(os.environ, {'RUN_MAIN': ''}):
+            apps.get_app_config('products').ready()
+        mock_start.assert_not_called()
+
+        with patch.object(sys, 'argv', ['manage.py', 'runserver']), patch.dict(os.environ, {'RUN_MAIN': 'true'}):
+            apps.get_app_config('products').ready()
+        mock_start.assert_called_once()
+
+        with patch.object(sys, 'argv', ['manage.py', 'runserver', '--noreload']), patch.dict(os.environ, {'RUN_MAIN': ''}):
+            apps.get_app_config('products').ready()
+        self.assertEqual(mock_start.call_count, 2)
+
+    def test_queue_sampler_runs_in_process_serving_metrics(self, mock_sampler):
+        """Test du queue sampler sous runserver : démarré dans l'enfant qui sert /metrics, pas dans le parent"""
+        with patch('products.service_product.start_consumer_thread'):
+            with patch.object(sys, 'argv', ['manage.py', 'runserver']), patch.dict(os.environ, {'RUN_MAIN': ''}):
+                apps.get_app_config('products').ready()
+            mock_sampler.assert_not_called()
+
+            with patch.object(sys, 'argv', ['manage.py', 'runserver']), patch.dict(os.environ, {'RUN_MAIN': 'true'}):
+                apps.get_app_config('products').ready()
+            mock_sampler.assert_called_once()
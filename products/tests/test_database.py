@@ -0,0 +1,73 @@
+import os
+import tempfile
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from products.database import sqlite_pragmas
+
+
+class SQLiteConfigurationTest(SimpleTestCase):
+    def open_file_database(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = dict(connection.settings_dict, NAME=os.path.join(directory.name, 'db.sqlite3'))
+        wrapper = DatabaseWrapper(settings_dict, alias='sqlite-config-test')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connection_is_configured(self):
+        """Test du hook connection_created : synchronous NORMAL, busy timeout, mmap et cache"""
+        wrapper = self.open_file_database()
+
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 256 * 1024 * 1024)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64000)
+
+    def test_connection_does_not_rewrite_database_file(self):
+        """Test du hook : aucun PRAGMA persistant, le mode de journal du fichier est inchangé"""
+        wrapper = self.open_file_database()
+
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+
+    def test_migration_enables_wal_once(self):
+        """Test de la migration 0010 : mode WAL enregistré dans la base, réversible"""
+        wrapper = self.open_file_database()
+        migration = import_module('products.migrations.0010_sqlite_wal')
+        run_python = migration.Migration.operations[0]
+        schema_editor = SimpleNamespace(connection=wrapper)
+
+        run_python.code(None, schema_editor)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+
+        run_python.reverse_code(None, schema_editor)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+
+    @override_settings(SQLITE_SYNCHRONOUS='full', SQLITE_BUSY_TIMEOUT=250)
+    def test_settings_override_pragmas(self):
+        """Test des settings SQLITE_* : valeurs reprises telles quelles"""
+        wrapper = self.open_file_database()
+
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 2)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 250)
+
+    @override_settings(SQLITE_SYNCHRONOUS='normal; DROP TABLE products_product')
+    def test_unknown_mode_is_rejected(self):
+        """Test d'une valeur inconnue : refusée plutôt qu'interpolée dans le PRAGMA"""
+        with self.assertRaises(ValueError):
+            sqlite_pragmas()
+
+    def test_persistent_connections_are_enabled(self):
+        """Test des connexions persistantes vérifiées avant réutilisation"""
+        self.assertGreater(connection.settings_dict['CONN_MAX_AGE'], 0)
+        self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+
+from products.dispatcher import EventDispatcher, _file_lock
+from products.service_product import publish_stock_updated
+
+
+class EventDispatcherTest(TestCase):
+    def setUp(self):
+        self.publisher = MagicMock()
+        self.spill_dir = tempfile.TemporaryDirectory()
+        self.spill_path = os.path.join(self.spill_dir.name, 'spill.ndjson')
+
+    def tearDown(self):
+        self.spill_dir.cleanup()
+
+    def make_dispatcher(self, **kwargs):
+        options = {'publisher': self.publisher, 'maxsize': 2, 'batch_size': 10, 'spill_path': self.spill_path}
+        options.update(kwargs)
+        return EventDispatcher(**options)
+
+    def published(self):
+        return [
+            message['product_id']
+            for call in self.publisher.publish_batch.call_args_list
+            for _, message in call[0][0]
+        ]
+
+    def test_events_are_published_in_batches(self):
+        """Test de la publication par lots depuis le thread"""
+        dispatcher = self.make_dispatcher(maxsize=100)
+        for product_id in range(5):
+            dispatcher.enqueue('stock.updated', {'product_id': product_id})
+        dispatcher.start()
+
+        deadline = time.time() + 2
+        while len(self.published()) < 5 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(self.published(), [0, 1, 2, 3, 4])
+        self.assertEqual(self.publisher.publish_batch.call_count, 1)
+
+    def test_drop_oldest_policy(self):
+        """Test de la politique drop_oldest quand la file est pleine"""
+        dispatcher = self.make_dispatcher(overflow='drop_oldest')
+        for product_id in range(4):
+            dispatcher.enqueue('stock.updated', {'product_id': product_id})
+
+        dispatcher.flush()
+        self.assertEqual(self.published(), [2, 3])
+
+    def test_block_policy_gives_up_after_timeout(self):
+        """Test de la politique block : attente bornée puis abandon"""
+        dispatcher = self.make_dispatcher(overflow='block', block_timeout=0.01)
+        for product_id in range(3):
+            dispatcher.enqueue('stock.updated', {'product_id': product_id})
+
+        dispatcher.flush()
+        self.assertEqual(self.published(), [0, 1])
+
+    def test_spill_policy_writes_to_disk_and_replays(self):
+        """Test de la politique spill : écriture sur disque puis republication"""
+        dispatcher = self.make_dispatcher(overflow='spill')
+        for product_id in range(4):
+            dispatcher.enqueue('stock.updated', {'product_id': product_id})
+
+        with open(self.spill_path) as spill_file:
+            spilled = [json.loads(line)['message']['product_id'] for line in spill_file]
+        self.assertEqual(spilled, [2, 3])
+
+        dispatcher.flush()
+        dispatcher._drain_spill()
+        self.assertEqual(self.published(), [0, 1, 2, 3])
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_spill_is_drained_by_one_worker_at_a_time(self):
+        """Test du fichier de débordement partagé : un worker qui republie déjà bloque les autres"""
+        spilling = self.make_dispatcher(overflow='spill', maxsize=1)
+        draining = self.make_dispatcher(overflow='spill')
+        for product_id in range(3):
+            spilling.enqueue('stock.updated', {'product_id': product_id})
+
+        with _file_lock(self.spill_path + '.drain.lock', blocking=False) as acquired:
+            self.assertTrue(acquired)
+            draining._drain_spill()
+        self.assertEqual(self.published(), [])
+        self.assertTrue(os.path.exists(self.spill_path))
+
+        draining._drain_spill()
+        spilling._drain_spill()
+        self.assertEqual(self.published(), [1, 2])
+        self.assertFalse(os.path.exists(self.spill_path + '.draining'))
+
+    def test_unknown_overflow_policy(self):
+        """Test d'une politique de débordement inconnue"""
+        with self.assertRaises(ValueError):
+            self.make_dispatcher(overflow='ignore')
+
+    @override_settings(EVENT_DISPATCH_MODE='background')
+    @patch('products.service_product.get_dispatcher')
+    def test_background_mode_enqueues(self, mock_get_dispatcher):
+        """Test du mode background : l'événement est mis en file, pas publié"""
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_stock_updated(1, 5)
+
+        mock_get_dispatcher.return_value.enqueue.assert_called_once()
+        routing_key, message = mock_get_dispatcher.return_value.enqueue.call_args[0]
+        self.assertEqual(routing_key, 'stock.updated')
+        self.assertEqual(message['new_stock'], 5)
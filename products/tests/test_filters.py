@@ -0,0 +1,133 @@
+from decimal import Decimal
+from itertools import combinations
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from products.filters import ORDERING_FIELDS, filter_products, get_ordering
+from products.models import Product
+
+
+class ProductListFilterTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [
+            Product.objects.create(name=name, description='D', price=Decimal(price), stock=stock)
+            for name, price, stock in (
+                ('Bureau', '250.00', 0), ('Chaise', '45.00', 12), ('Lampe', '30.00', 3),
+                ('Tapis', '45.00', 7), ('Miroir', '80.00', 0),
+            )
+        ]
+        self.url = reverse('product-list-create')
+
+    def names(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product['name'] for product in response.data]
+
+    def test_in_stock_price_band(self):
+        """Test d'une fourchette de prix parmi les produits disponibles, triée par prix puis id"""
+        self.assertEqual(
+            self.names({'min_price': '40', 'max_price': '100', 'available': 'true'}),
+            ['Chaise', 'Tapis']
+        )
+
+    def test_min_stock_and_unavailable(self):
+        """Test des filtres de stock"""
+        self.assertEqual(self.names({'min_stock': 7}), ['Tapis', 'Chaise'])
+        self.assertEqual(self.names({'available': 'false', 'ordering': 'name'}), ['Bureau', 'Miroir'])
+
+    def test_ordering(self):
+        """Test des tris, départagés par l'id"""
+        self.assertEqual(self.names({'ordering': '-price'}), ['Bureau', 'Miroir', 'Tapis', 'Chaise', 'Lampe'])
+        self.assertEqual(self.names({'ordering': 'name'}), sorted(p.name for p in self.products))
+        self.assertEqual(self.names({}), [p.name for p in self.products])
+
+    def test_ordering_with_cursor_pagination(self):
+        """Test de la pagination par curseur sur un tri par prix"""
+        names = []
+        response = self.client.get(self.url, {'ordering': 'price', 'page_size': 2})
+        while True:
+            names.extend(product['name'] for product in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(names, ['Lampe', 'Chaise', 'Tapis', 'Miroir', 'Bureau'])
+
+    def test_filter_ordered_on_another_field_with_cursor_pagination(self):
+        """Test d'un filtre de stock trié par nom, page par page"""
+        names = []
+        response = self.client.get(self.url, {'min_stock': 3, 'ordering': '-name', 'page_size': 1})
+        while True:
+            names.extend(product['name'] for product in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(names, ['Tapis', 'Lampe', 'Chaise'])
+
+    def test_invalid_parameters(self):
+        """Test des valeurs invalides : 400"""
+        for params in ({'min_price': 'abc'}, {'max_price': '-1'}, {'min_stock': '1.5'},
+                       {'available': 'maybe'}, {'ordering': 'description'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class ProductListQueryPlanTest(TestCase):
+    FILTERS = {'min_price': '10', 'max_price': '100', 'min_stock': '5', 'available': 'true'}
+
+    def plan(self, params):
+        queryset = filter_products(Product.objects.all(), params, get_ordering(params))[:100]
+        sql, sql_params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', sql_params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexed(self, params):
+        plan = self.plan(params)
+        if set(params) & set(self.FILTERS):
+            # Une liste filtrée ne parcourt jamais toute la table, même dans l'ordre d'un index
+            full_scans = [step for step in plan if step.startswith('SCAN ')]
+        else:
+            full_scans = [step for step in plan if step.startswith('SCAN products_product') and 'INDEX' not in step]
+        self.assertEqual(full_scans, [], f'{params}: {plan}')
+
+    def test_filters_use_indexes(self):
+        """Test EXPLAIN : aucune combinaison de filtres ne parcourt toute la table"""
+        names = list(self.FILTERS)
+        for size in range(1, len(names) + 1):
+            for combination in combinations(names, size):
+                self.assertIndexed({name: self.FILTERS[name] for name in combination})
+
+    def test_orderings_use_indexes(self):
+        """Test EXPLAIN : chaque tri est servi par un index, sans tri temporaire"""
+        for field in ORDERING_FIELDS:
+            for ordering in (field, f'-{field}'):
+                plan = self.plan({'ordering': ordering})
+                self.assertFalse(any('TEMP B-TREE' in step for step in plan), f'{ordering}: {plan}')
+                if field != 'id':
+                    self.assertIndexed({'ordering': ordering})
+
+    def test_filters_with_any_ordering_use_indexes(self):
+        """Test EXPLAIN : chaque combinaison de filtres, sous chaque tri, est une recherche par index"""
+        names = list(self.FILTERS)
+        for size in range(1, len(names) + 1):
+            for combination in combinations(names, size):
+                for field in ORDERING_FIELDS:
+                    for ordering in (field, f'-{field}'):
+                        params = {name: self.FILTERS[name] for name in combination}
+                        self.assertIndexed({**params, 'ordering': ordering})
+
+    def test_filter_with_matching_ordering_is_a_range_search(self):
+        """Test EXPLAIN : un filtre trié sur son propre champ est une recherche d'intervalle ordonnée"""
+        for params, index in (({'min_price': '10', 'ordering': '-price'}, 'product_price_idx'),
+                              ({'min_stock': '5', 'ordering': 'stock'}, 'product_stock_idx')):
+            plan = ' '.join(self.plan(params))
+            self.assertIn(f'SEARCH products_product USING INDEX {index}', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from pika.exceptions import AMQPConnectionError
+from prometheus_client import REGISTRY
+from rest_framework.test import APITestCase
+
+from products.middleware import UNMATCHED_ENDPOINT, _http_metric_children, http_requests_total
+from products.consumer import QueueBuffer, run_handler
+from products.models import Product
+from products.publisher import RabbitMQPublisher
+
+
+def requests_count(method, endpoint, status_code):
+    return http_requests_total.labels(
+        method=method, endpoint=endpoint, status_code=status_code, service='product'
+    )._value.get()
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class MetricsMiddlewareTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [
+            Product.objects.create(name=f'P{i}', description='D', price=Decimal('1.00'), stock=i)
+            for i in range(3)
+        ]
+
+    def test_endpoint_label_is_route_template(self):
+        """Test de l'étiquette endpoint : une seule série pour tous les produits"""
+        endpoint = '/api/products/<int:pk>/'
+        before = requests_count('GET', endpoint, 200)
+
+        for product in self.products:
+            self.client.get(f'/api/products/{product.id}/')
+
+        self.assertEqual(requests_count('GET', endpoint, 200), before + 3)
+        self.assertFalse(any(f'/api/products/{p.id}/' in key for key in _http_metric_children for p in self.products))
+
+    def test_unmatched_paths_share_fallback_bucket(self):
+        """Test des chemins inconnus : regroupés dans une étiquette fixe"""
+        before = requests_count('GET', UNMATCHED_ENDPOINT, 404)
+
+        self.client.get('/does-not-exist/1')
+        self.client.get('/does-not-exist/2')
+
+        self.assertEqual(requests_count('GET', UNMATCHED_ENDPOINT, 404), before + 2)
+
+    def test_label_children_are_reused(self):
+        """Test du cache des séries : pas de nouvelle entrée pour une route déjà vue"""
+        self.client.get(f'/api/products/{self.products[0].id}/stock/')
+        size = len(_http_metric_children)
+
+        for product in self.products:
+            self.client.get(f'/api/products/{product.id}/stock/')
+
+        self.assertEqual(len(_http_metric_children), size)
+
+    def test_consumer_thread_metrics_are_served_by_metrics_endpoint(self):
+        """Test : les mesures du thread consumer du processus web sont exposées par son /metrics"""
+        consumer = threading.Thread(
+            target=run_handler, args=(MagicMock(), [{'n': 1}], 'metrics_queue', 'metrics.scraped')
+        )
+        consumer.start()
+        consumer.join()
+
+        response = self.client.get('/metrics/')
+
+        self.assertIn('rabbitmq_handler_duration_seconds_count{', response.content.decode())
+        self.assertIn('routing_key="metrics.scraped"', response.content.decode())
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class EventPipelineMetricsTest(SimpleTestCase):
+    @patch('products.publisher.pika.BlockingConnection')
+    def test_publish_is_timed_per_routing_key(self, mock_connection):
+        """Test de la mesure de publication par routing key"""
+        before = sample('rabbitmq_publish_duration_seconds_count', routing_key='metrics.test')
+
+        RabbitMQPublisher(host='localhost').publish('metrics.test', {'n': 1})
+
+        self.assertEqual(sample('rabbitmq_publish_duration_seconds_count', routing_key='metrics.test'), before + 1)
+
+    @patch('products.publisher.pika.BlockingConnection')
+    def test_publish_failure_and_reconnect_are_counted(self, mock_connection):
+        """Test des compteurs d'échec et de reconnexion du publisher"""
+        channel = mock_connection.return_value.channel.return_value
+        channel.basic_publish.side_effect = AMQPConnectionError('down')
+        failures = sample('rabbitmq_failures_total', routing_key='metrics.fail', stage='publish')
+        reconnects = sample('rabbitmq_reconnects_total', component='publisher')
+
+        with self.assertRaises(AMQPConnectionError):
+            RabbitMQPublisher(host='localhost').publish('metrics.fail', {'n': 1})
+
+        self.assertEqual(sample('rabbitmq_failures_total', routing_key='metrics.fail', stage='publish'), failures + 1)
+        self.assertEqual(sample('rabbitmq_reconnects_total', component='publisher'), reconnects + 1)
+
+    def test_handler_duration_and_message_age(self):
+        """Test des histogrammes de traitement et d'âge des messages consommés"""
+        buffer = QueueBuffer(MagicMock(), 'metrics_queue', MagicMock(), 2, 60, routing_key='metrics.handled')
+        handled = sample('rabbitmq_handler_duration_seconds_count', routing_key='metrics.handled')
+        age_sum = sample('rabbitmq_message_age_seconds_sum', routing_key='metrics.handled')
+
+        for tag in (1, 2):
+            buffer.append(buffer.channel, MagicMock(delivery_tag=tag), MagicMock(),
+                          json.dumps({'timestamp': time.time() - 5}).encode('utf-8'))
+
+        self.assertEqual(sample('rabbitmq_handler_duration_seconds_count', routing_key='metrics.handled'), handled + 1)
+        self.assertAlmostEqual(
+            sample('rabbitmq_message_age_seconds_sum', routing_key='metrics.handled') - age_sum, 10, delta=1
+        )
+
+    def test_handler_failures_are_counted(self):
+        """Test du compteur d'échecs de traitement (lot puis message par message)"""
+        buffer = QueueBuffer(MagicMock(), 'metrics_queue', MagicMock(side_effect=ValueError('boom')), 1, 60,
+                             routing_key='metrics.failed')
+        before = sample('rabbitmq_failures_total', routing_key='metrics.failed', stage='handler')
+
+        buffer.append(buffer.channel, MagicMock(delivery_tag=1, redelivered=False), MagicMock(), b'{}')
+
+        self.assertEqual(sample('rabbitmq_failures_total', routing_key='metrics.failed', stage='handler'), before + 2)
@@ -0,0 +1,89 @@
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from products.models import OutboxEvent, Product
+from products.outbox import relay_pending_events
+from products.service_product import publish_stock_updated
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class OutboxWriteTest(APITestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Test Product', description='Test Description', price=Decimal('19.99'), stock=10
+        )
+
+    def test_publish_writes_outbox_row(self):
+        """Test de l'écriture d'un événement dans l'outbox"""
+        publish_stock_updated(self.product.id, 5)
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.routing_key, 'stock.updated')
+        self.assertEqual(event.payload['new_stock'], 5)
+        self.assertIsNone(event.sent_at)
+
+    def test_stock_update_and_event_are_written_together(self):
+        """Test de l'écriture du stock et de l'événement dans la même transaction"""
+        url = reverse('update-product-stock', kwargs={'product_id': self.product.id})
+        response = self.client.patch(url, {'stock': 3}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(OutboxEvent.objects.filter(routing_key='stock.updated').count(), 1)
+
+    @patch('products.service_product.write_outbox_event', side_effect=DatabaseError('disk full'))
+    def test_stock_update_rolled_back_when_outbox_write_fails(self, mock_write):
+        """Test de l'annulation de la mise à jour si l'événement ne peut pas être écrit"""
+        url = reverse('update-product-stock', kwargs={'product_id': self.product.id})
+
+        with self.assertRaises(DatabaseError):
+            self.client.patch(url, {'stock': 3}, format='json')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+
+
+class OutboxRelayTest(TestCase):
+    def setUp(self):
+        for product_id in range(5):
+            OutboxEvent.objects.create(routing_key='stock.updated', payload={'product_id': product_id})
+
+    def test_relay_publishes_in_order_and_marks_sent(self):
+        """Test du relais : publication ordonnée par lot puis marquage"""
+        publisher = MagicMock()
+
+        self.assertEqual(relay_pending_events(publisher, batch_size=3), 3)
+        self.assertEqual(relay_pending_events(publisher, batch_size=3), 2)
+        self.assertEqual(relay_pending_events(publisher, batch_size=3), 0)
+
+        published = [
+            message['product_id']
+            for call in publisher.publish_batch.call_args_list
+            for _, message in call[0][0]
+        ]
+        self.assertEqual(published, [0, 1, 2, 3, 4])
+        self.assertFalse(OutboxEvent.objects.filter(sent_at__isnull=True).exists())
+
+    def test_relay_failure_keeps_events_pending(self):
+        """Test d'un échec de publication : les événements restent en attente"""
+        publisher = MagicMock()
+        publisher.publish_batch.side_effect = Exception('Connection error')
+
+        with self.assertRaises(Exception):
+            relay_pending_events(publisher)
+
+        self.assertEqual(OutboxEvent.objects.filter(sent_at__isnull=True).count(), 5)
+
+    @patch('products.management.commands.relay_outbox.RabbitMQPublisher')
+    def test_relay_command_once(self, mock_publisher_class):
+        """Test de la commande relay_outbox --once"""
+        call_command('relay_outbox', '--once', '--batch-size', '2', stdout=MagicMock())
+
+        self.assertEqual(mock_publisher_class.return_value.publish_batch.call_count, 3)
+        self.assertFalse(OutboxEvent.objects.filter(sent_at__isnull=True).exists())
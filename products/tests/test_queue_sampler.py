@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+from pika.exceptions import AMQPConnectionError, ChannelClosedByBroker
+
+from products.consumer import CONSUMED_QUEUES, ORDER_QUEUE, STOCK_QUEUE
+from products.middleware import get_rabbitmq_queue_info, rabbitmq_queue_lag_seconds, rabbitmq_queue_size
+from products.queue_sampler import QueueSampler, get_queue_sampler
+
+
+def declare_ok(message_count, consumer_count=1):
+    return MagicMock(method=MagicMock(message_count=message_count, consumer_count=consumer_count))
+
+
+@patch('products.queue_sampler.pika.BlockingConnection')
+class QueueSamplerTest(SimpleTestCase):
+    def setUp(self):
+        self.sampler = QueueSampler(host='localhost', interval=60)
+
+    def channel(self, mock_connection):
+        return mock_connection.return_value.channel.return_value
+
+    def test_samples_consumed_queues_on_one_connection(self, mock_connection):
+        """Test de la mesure des deux queues consommées, connexion réutilisée"""
+        channel = self.channel(mock_connection)
+        channel.queue_declare.side_effect = [declare_ok(4, 2), declare_ok(0, 1)] * 2
+
+        self.sampler.sample_once()
+        snapshot = self.sampler.sample_once()
+
+        mock_connection.assert_called_once()
+        self.assertEqual([c.kwargs['queue'] for c in channel.queue_declare.call_args_list], list(CONSUMED_QUEUES) * 2)
+        self.assertTrue(all(c.kwargs['passive'] for c in channel.queue_declare.call_args_list))
+        self.assertEqual(snapshot[ORDER_QUEUE]['messages'], 4)
+        self.assertEqual(snapshot[ORDER_QUEUE]['consumers'], 2)
+        self.assertEqual(snapshot[STOCK_QUEUE]['lag_seconds'], 0.0)
+        self.assertEqual(rabbitmq_queue_size.labels(queue=ORDER_QUEUE)._value.get(), 4)
+
+    def test_lag_grows_until_queue_drains(self, mock_connection):
+        """Test du lag : temps écoulé depuis la dernière fois où la queue était vide"""
+        channel = self.channel(mock_connection)
+        self.sampler.queues = (ORDER_QUEUE,)
+        channel.queue_declare.side_effect = [declare_ok(0), declare_ok(10), declare_ok(0)]
+
+        with patch('products.queue_sampler.time.monotonic', side_effect=[100.0, 130.0, 140.0]):
+            self.sampler.sample_once()
+            self.assertEqual(self.sampler.sample_once()[ORDER_QUEUE]['lag_seconds'], 30.0)
+            self.assertEqual(rabbitmq_queue_lag_seconds.labels(queue=ORDER_QUEUE)._value.get(), 30.0)
+            self.assertEqual(self.sampler.sample_once()[ORDER_QUEUE]['lag_seconds'], 0.0)
+
+    def test_missing_queue_is_skipped(self, mock_connection):
+        """Test d'une queue pas encore déclarée : le channel est rouvert, l'autre queue est mesurée"""
+        channel = self.channel(mock_connection)
+        channel.queue_declare.side_effect = [ChannelClosedByBroker(404, 'NOT_FOUND'), declare_ok(3)]
+
+        snapshot = self.sampler.sample_once()
+
+        self.assertEqual(list(snapshot), [STOCK_QUEUE])
+        self.assertEqual(mock_connection.return_value.channel.call_count, 2)
+
+    def test_broker_errors_reset_connection(self, mock_connection):
+        """Test d'une erreur de connexion : le thread continue et se reconnecte au tour suivant"""
+        mock_connection.side_effect = AMQPConnectionError('down')
+        self.sampler._stop.wait = MagicMock(side_effect=lambda _: self.sampler._stop.set())
+
+        self.sampler._run()
+
+        self.assertIsNone(self.sampler._connection)
+
+    def test_queue_info_reads_cached_sample(self, mock_connection):
+        """Test de get_rabbitmq_queue_info : dernière mesure, sans appel au broker"""
+        sampler = get_queue_sampler()
+        self.addCleanup(setattr, sampler, '_snapshot', {})
+        sampler._snapshot = {ORDER_QUEUE: {'messages': 7, 'consumers': 1, 'lag_seconds': 2.0}}
+
+        self.assertEqual(get_rabbitmq_queue_info()[ORDER_QUEUE]['messages'], 7)
+        mock_connection.assert_not_called()
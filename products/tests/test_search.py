@@ -0,0 +1,111 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.apps import apps
+from django.db import connection
+from django.db.models.signals import post_migrate
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from products.models import Product
+from products.search import FTS_TRIGGERS, find_products, fts_available, scan_products, search_terms
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class ProductSearchTest(APITestCase):
+    def setUp(self):
+        self.chair = Product.objects.create(
+            name='Chaise en chêne', description='Assise confortable', price=Decimal('49.00'), stock=5
+        )
+        self.table = Product.objects.create(
+            name='Table basse', description='Plateau en chêne massif, pieds en métal', price=Decimal('199.00'), stock=2
+        )
+        self.lamp = Product.objects.create(
+            name='Lampe', description='Abat-jour en lin', price=Decimal('29.00'), stock=10
+        )
+        self.url = reverse('product-search')
+
+    def ids(self, response):
+        return [product['id'] for product in response.data['results']]
+
+    def test_fts_index_is_available(self):
+        """Test de la présence de l'index FTS5 sur SQLite"""
+        self.assertEqual(fts_available(), connection.vendor == 'sqlite')
+
+    def test_results_are_ranked(self):
+        """Test du classement : un mot du nom pèse plus qu'un mot de la description"""
+        response = self.client.get(self.url, {'q': 'chene'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.ids(response), [self.chair.id, self.table.id])
+
+    def test_prefix_and_all_terms(self):
+        """Test de la recherche par préfixe, tous les mots étant requis"""
+        response = self.client.get(self.url, {'q': 'tab mét'})
+        self.assertEqual(self.ids(response), [self.table.id])
+
+    def test_index_follows_writes(self):
+        """Test de la synchronisation de l'index (update, bulk_update, delete)"""
+        self.client.patch(reverse('product-detail', kwargs={'pk': self.lamp.id}), {'name': 'Lampe de chevet'}, format='json')
+        self.assertEqual(self.ids(self.client.get(self.url, {'q': 'chevet'})), [self.lamp.id])
+
+        self.lamp.name = 'Liseuse'
+        Product.objects.bulk_update([self.lamp], ['name'])
+        self.assertEqual(self.ids(self.client.get(self.url, {'q': 'chevet'})), [])
+
+        self.chair.delete()
+        self.assertEqual(self.ids(self.client.get(self.url, {'q': 'chaise'})), [])
+
+    def test_pagination(self):
+        """Test de la pagination des résultats"""
+        response = self.client.get(self.url, {'q': 'chêne', 'page_size': 1})
+
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Test d'une saisie contenant de la syntaxe FTS5"""
+        response = self.client.get(self.url, {'q': 'lampe" OR NEAR(*'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(response), [])
+
+    def test_missing_query(self):
+        """Test d'une recherche sans mot"""
+        for params in ({}, {'q': '  ?! '}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_scan_fallback(self):
+        """Test de la recherche sans index (autres bases)"""
+        products = scan_products(search_terms('chêne métal'))
+        self.assertEqual(list(products), [self.table])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Index FTS5 propre à SQLite')
+class SearchTriggersTest(TestCase):
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'products_product'")
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_triggers_exist_after_migrate(self):
+        """Test de la présence des trois triggers de l'index après les migrations"""
+        self.assertLessEqual(set(FTS_TRIGGERS), self.triggers())
+
+    def test_post_migrate_restores_dropped_triggers(self):
+        """Test d'une reconstruction de table ayant supprimé un trigger : recréé au migrate suivant, index rattrapé"""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER products_product_fts_insert')
+        product = Product.objects.create(name='Tabouret', description='Bois', price=Decimal('15.00'), stock=1)
+        self.assertEqual(list(find_products('tabouret')[:10]), [])
+
+        config = apps.get_app_config('products')
+        post_migrate.send(sender=config, app_config=config, verbosity=0, interactive=False, using='default',
+                          apps=apps, plan=[])
+
+        self.assertLessEqual(set(FTS_TRIGGERS), self.triggers())
+        self.assertEqual(list(find_products('tabouret')[:10]), [product])
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Product
+from products.serializers import ProductSerializer, product_fields, serialize_product_rows
+
+
+class SerializeProductRowsTest(TestCase):
+    def setUp(self):
+        Product.objects.create(name='Chaise', description='Assise', price=Decimal('49.90'), stock=5)
+        Product.objects.create(name='Lampe "é"', description='', price=Decimal('0'), stock=0)
+        Product.objects.create(name='Table', description='Plateau\nchêne', price=Decimal('1234.5'), stock=-1)
+        # Datetime sans microsecondes : isoformat() change de forme
+        Product.objects.filter(name='Table').update(updated_at=timezone.now().replace(microsecond=0))
+
+    def render_both(self):
+        queryset = Product.objects.order_by('id')
+        expected = JSONRenderer().render(ProductSerializer(queryset, many=True).data)
+        actual = JSONRenderer().render(serialize_product_rows(queryset.values(*product_fields())))
+        return expected, actual
+
+    def test_output_is_byte_identical(self):
+        """Test de l'identité octet par octet avec ProductSerializer"""
+        expected, actual = self.render_both()
+        self.assertEqual(actual, expected)
+
+    @override_settings(TIME_ZONE='Europe/Paris')
+    def test_output_is_identical_in_other_timezone(self):
+        """Test d'un fuseau horaire non UTC (repli sur le champ DRF)"""
+        expected, actual = self.render_both()
+        self.assertEqual(actual, expected)
+
+    def test_unquantized_decimal_falls_back(self):
+        """Test d'un décimal à une autre précision que celle du champ"""
+        row = dict(Product.objects.values(*product_fields()).first(), price=Decimal('3.5'))
+        self.assertEqual(serialize_product_rows([row])[0]['price'], '3.50')
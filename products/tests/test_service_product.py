@@ -1,9 +1,11 @@
-from django.test import TestCase
+from django.db import transaction
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from unittest.mock import patch, MagicMock
 from decimal import Decimal
 import json
+import pika
 from products.service_product import (
     publish_product_created,
     publish_product_updated,
@@ -11,10 +13,16 @@ from products.service_product import (
     callback_order_created,
     callback_stock_updated
 )
-from products.models import Product
+from products.models import OutboxEvent, Product
+from products.dedup import reset_deduplicator
+from products.publisher import RabbitMQPublisher, reset_publisher
 
+@override_settings(EVENT_DISPATCH_MODE='sync')
 class PublishProductCreatedTest(TestCase):
-    @patch('products.service_product.pika.BlockingConnection')
+    def setUp(self):
+        reset_publisher()
+
+    @patch('products.publisher.pika.BlockingConnection')
     def test_publish_product_created_success(self, mock_connection):
         """Test de publication d'un produit """
         # Mock de la connexion RabbitMQ
@@ -30,7 +38,8 @@ class PublishProductCreatedTest(TestCase):
             'stock': 10
         }
         
-        publish_product_created(product_data)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_product_created(product_data)
         
         # Vérifier que l'exchange a été déclaré
         mock_channel.exchange_declare.assert_called_once_with(
@@ -53,10 +62,10 @@ class PublishProductCreatedTest(TestCase):
         self.assertEqual(message_body['stock'], 10)
         self.assertIn('timestamp', message_body)
         
-        # Vérifier que la connexion a été fermée
-        mock_connection_instance.close.assert_called_once()
+        # La connexion reste ouverte pour les publications suivantes
+        mock_connection_instance.close.assert_not_called()
 
-    @patch('products.service_product.pika.BlockingConnection')
+    @patch('products.publisher.pika.BlockingConnection')
     def test_publish_product_created_connection_error(self, mock_connection):
         """Test de publication avec une erreur de connexion"""
         mock_connection.side_effect = Exception("Connection error")
@@ -69,10 +78,15 @@ class PublishProductCreatedTest(TestCase):
         }
         
         # Ne devrait pas lever d'exception
-        publish_product_created(product_data)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_product_created(product_data)
 
+@override_settings(EVENT_DISPATCH_MODE='sync')
 class PublishProductUpdatedTest(TestCase):
-    @patch('products.service_product.pika.BlockingConnection')
+    def setUp(self):
+        reset_publisher()
+
+    @patch('products.publisher.pika.BlockingConnection')
     def test_publish_product_updated_success(self, mock_connection):
         """Test de publication d'un produit mis à jour"""
         # Mock de la connexion RabbitMQ
@@ -88,7 +102,8 @@ class PublishProductUpdatedTest(TestCase):
             'stock': 15
         }
         
-        publish_product_updated(product_data)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_product_updated(product_data)
         
         # Vérifier que l'exchange a été déclaré
         mock_channel.exchange_declare.assert_called_once_with(
@@ -111,10 +126,10 @@ class PublishProductUpdatedTest(TestCase):
         self.assertEqual(message_body['stock'], 15)
         self.assertIn('timestamp', message_body)
         
-        # Vérifier que la connexion a été fermée
-        mock_connection_instance.close.assert_called_once()
+        # La connexion reste ouverte pour les publications suivantes
+        mock_connection_instance.close.assert_not_called()
 
-    @patch('products.service_product.pika.BlockingConnection')
+    @patch('products.publisher.pika.BlockingConnection')
     def test_publish_product_updated_connection_error(self, mock_connection):
         """Test de publication avec une erreur de connexion"""
         mock_connection.side_effect = Exception("Connection error")
@@ -127,10 +142,15 @@ class PublishProductUpdatedTest(TestCase):
         }
         
         # Ne devrait pas lever d'exception
-        publish_product_updated(product_data)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_product_updated(product_data)
 
+@override_settings(EVENT_DISPATCH_MODE='sync')
 class PublishStockUpdatedTest(TestCase):
-    @patch('products.service_product.pika.BlockingConnection')
+    def setUp(self):
+        reset_publisher()
+
+    @patch('products.publisher.pika.BlockingConnection')
     def test_publish_stock_updated_success(self, mock_connection):
         """Test de publication d'une mise à jour de stock"""
         # Mock de la connexion RabbitMQ
@@ -142,7 +162,8 @@ class PublishStockUpdatedTest(TestCase):
         product_id = 1
         new_stock = 5
         
-        publish_stock_updated(product_id, new_stock)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_stock_updated(product_id, new_stock)
         
         # Vérifier que l'exchange a été déclaré
         mock_channel.exchange_declare.assert_called_once_with(
@@ -163,10 +184,10 @@ class PublishStockUpdatedTest(TestCase):
         self.assertEqual(message_body['new_stock'], 5)
         self.assertIn('timestamp', message_body)
         
-        # Vérifier que la connexion a été fermée
-        mock_connection_instance.close.assert_called_once()
+        # La connexion reste ouverte pour les publications suivantes
+        mock_connection_instance.close.assert_not_called()
 
-    @patch('products.service_product.pika.BlockingConnection')
+    @patch('products.publisher.pika.BlockingConnection')
     def test_publish_stock_updated_connection_error(self, mock_connection):
         """Test de publication avec une erreur de connexion"""
         mock_connection.side_effect = Exception("Connection error")
@@ -175,9 +196,91 @@ class PublishStockUpdatedTest(TestCase):
         new_stock = 5
         
         # Ne devrait pas lever d'exception
-        publish_stock_updated(product_id, new_stock)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_stock_updated(product_id, new_stock)
+
+@override_settings(EVENT_DISPATCH_MODE='sync')
+class EventEmissionTransactionTest(TestCase):
+    @patch('products.service_product.get_transport')
+    def test_event_is_published_after_commit(self, mock_get_transport):
+        """Test de la publication différée : rien ne part avant le commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                publish_stock_updated(1, 5)
+                mock_get_transport.return_value.publish.assert_not_called()
+
+        mock_get_transport.return_value.publish.assert_called_once()
+
+    @patch('products.service_product.get_transport')
+    def test_rolled_back_write_publishes_nothing(self, mock_get_transport):
+        """Test d'une transaction annulée : l'événement n'est jamais publié"""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    publish_stock_updated(1, 5)
+                    raise ValueError('rollback')
+            except ValueError:
+                pass
+
+        mock_get_transport.return_value.publish.assert_not_called()
+
+@override_settings(EVENT_DISPATCH_MODE='sync')
+class RabbitMQPublisherTest(TestCase):
+    def setUp(self):
+        reset_publisher()
+
+    @patch('products.publisher.pika.BlockingConnection')
+    def test_connection_reused_between_publishes(self, mock_connection):
+        """Test de la réutilisation de la connexion entre deux publications"""
+        mock_channel = MagicMock()
+        mock_connection.return_value.channel.return_value = mock_channel
+
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_stock_updated(1, 5)
+            publish_stock_updated(2, 3)
+            publish_product_created({'id': 1, 'name': 'P', 'price': Decimal('1.00'), 'stock': 1})
+
+        mock_connection.assert_called_once()
+        mock_channel.exchange_declare.assert_called_once()
+        self.assertEqual(mock_channel.basic_publish.call_count, 3)
+
+    @patch('products.publisher.pika.BlockingConnection')
+    def test_reconnect_after_connection_lost(self, mock_connection):
+        """Test de la reconnexion quand la connexion a été perdue"""
+        broken_channel = MagicMock()
+        broken_channel.basic_publish.side_effect = pika.exceptions.StreamLostError()
+        healthy_channel = MagicMock()
+        broken_connection = MagicMock()
+        broken_connection.channel.return_value = broken_channel
+        healthy_connection = MagicMock()
+        healthy_connection.channel.return_value = healthy_channel
+        mock_connection.side_effect = [broken_connection, healthy_connection]
 
+        publisher = RabbitMQPublisher(host='localhost')
+        publisher.publish('stock.updated', {'product_id': 1, 'new_stock': 5})
+
+        self.assertEqual(mock_connection.call_count, 2)
+        broken_connection.close.assert_called_once()
+        healthy_channel.basic_publish.assert_called_once()
+
+    @patch('products.publisher.pika.BlockingConnection')
+    def test_publisher_confirms(self, mock_connection):
+        """Test de l'activation des publisher confirms"""
+        mock_channel = MagicMock()
+        mock_connection.return_value.channel.return_value = mock_channel
+
+        RabbitMQPublisher(host='localhost', confirms=True).publish('stock.updated', {})
+        mock_channel.confirm_delivery.assert_called_once()
+
+        mock_channel.reset_mock()
+        RabbitMQPublisher(host='localhost', confirms=False).publish('stock.updated', {})
+        mock_channel.confirm_delivery.assert_not_called()
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
 class CallbackOrderCreatedTest(TestCase):
+    def setUp(self):
+        reset_deduplicator()
+
     def test_callback_order_created_success(self):
         """Test du callback pour un événement de création de commande"""
         # Créer un message de test
@@ -199,6 +302,11 @@ class CallbackOrderCreatedTest(TestCase):
         # Le callback ne devrait pas lever d'exception
         callback_order_created(ch, method, properties, body)
 
+        # Les produits n'existent pas : la commande est rejetée
+        event = OutboxEvent.objects.get(routing_key='order.rejected')
+        self.assertEqual(event.payload['order_id'], 1)
+        self.assertEqual(event.payload['reason'], 'stock_unavailable')
+
     def test_callback_order_created_invalid_json(self):
         """Test du callback avec un JSON invalide"""
         ch = MagicMock()
@@ -218,9 +326,11 @@ class CallbackOrderCreatedTest(TestCase):
         
         # Le callback ne devrait pas lever d'exception
         callback_order_created(ch, method, properties, body)
+        self.assertEqual(OutboxEvent.objects.get().payload['reason'], 'invalid_order')
 
 class CallbackStockUpdatedTest(TestCase):
     def setUp(self):
+        reset_deduplicator()
         # Créer un produit de test
         self.product = Product.objects.create(
             name='Test Product',
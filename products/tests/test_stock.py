@@ -0,0 +1,214 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from products.models import InsufficientStock, OutboxEvent, Product, StockLevel
+
+
+class AdjustStockTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Test Product', description='Test Description', price=Decimal('19.99'), stock=10
+        )
+
+    def test_decrement_returns_new_stock_in_one_query(self):
+        """Test d'une décrémentation en un seul UPDATE conditionnel"""
+        with CaptureQueriesContext(connection) as queries:
+            level = Product.objects.adjust_stock(self.product.id, -3)
+
+        self.assertEqual(level, StockLevel(stock=7, version=2))
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+
+    def test_increment(self):
+        """Test d'une incrémentation"""
+        self.assertEqual(Product.objects.adjust_stock(self.product.id, 5).stock, 15)
+
+    def test_decrement_cannot_go_below_zero(self):
+        """Test du garde-fou stock >= 0"""
+        self.assertEqual(Product.objects.adjust_stock(self.product.id, -10).stock, 0)
+
+        with self.assertRaises(InsufficientStock):
+            Product.objects.adjust_stock(self.product.id, -1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+
+    def test_adjust_unknown_product(self):
+        """Test d'une variation sur un produit inexistant"""
+        with self.assertRaises(Product.DoesNotExist):
+            Product.objects.adjust_stock(999, -1)
+
+    def test_decrement_without_update_returning(self):
+        """Test du chemin de repli pour les bases sans UPDATE ... RETURNING"""
+        with patch.object(connection, 'vendor', 'mysql'):
+            self.assertEqual(Product.objects.adjust_stock(self.product.id, -4).stock, 6)
+            with self.assertRaises(InsufficientStock):
+                Product.objects.adjust_stock(self.product.id, -7)
+
+    def test_set_stock_returns_old_and_new(self):
+        """Test du compare-and-set du stock"""
+        self.assertEqual(Product.objects.set_stock(self.product.id, 4), (10, StockLevel(stock=4, version=2)))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+
+    def test_adjust_stock_with_unrepresentable_delta(self):
+        """Test d'une décrémentation impossible à exprimer en SQL : stock insuffisant, pas d'erreur"""
+        with self.assertRaises(InsufficientStock):
+            Product.objects.adjust_stock(self.product.id, -2 ** 63)
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class AdjustStockAPITest(APITestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Test Product', description='Test Description', price=Decimal('19.99'), stock=10
+        )
+
+    def test_decrement_endpoint(self):
+        """Test de l'endpoint de décrémentation"""
+        url = reverse('decrement-product-stock', kwargs={'product_id': self.product.id})
+        response = self.client.post(url, {'quantity': 4}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['new_stock'], 6)
+        self.assertEqual(OutboxEvent.objects.get().payload['new_stock'], 6)
+
+    def test_decrement_endpoint_insufficient_stock(self):
+        """Test d'une décrémentation refusée faute de stock"""
+        url = reverse('decrement-product-stock', kwargs={'product_id': self.product.id})
+        response = self.client.post(url, {'quantity': 11}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_increment_endpoint_validates_quantity(self):
+        """Test de la validation de quantity"""
+        url = reverse('increment-product-stock', kwargs={'product_id': self.product.id})
+        for quantity in (0, -1, '3', True):
+            response = self.client.post(url, {'quantity': quantity}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_adjust_endpoints_reject_out_of_range_quantity(self):
+        """Test des quantités hors des bornes de la colonne : 400, sans écriture"""
+        for name in ('increment-product-stock', 'decrement-product-stock'):
+            url = reverse(name, kwargs={'product_id': self.product.id})
+            for quantity in (2 ** 63, 10 ** 20):
+                response = self.client.post(url, {'quantity': quantity}, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_increment_endpoint_unknown_product(self):
+        """Test d'une incrémentation sur un produit inexistant"""
+        url = reverse('increment-product-stock', kwargs={'product_id': 999})
+        response = self.client.post(url, {'quantity': 1}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_stock_reports_actual_old_stock(self):
+        """Test de l'ancien stock renvoyé après une modification concurrente"""
+        url = reverse('update-product-stock', kwargs={'product_id': self.product.id})
+        Product.objects.adjust_stock(self.product.id, -2)
+        response = self.client.patch(url, {'stock': 20}, format='json')
+
+        self.assertEqual(response.data['old_stock'], 8)
+        self.assertEqual(response.data['new_stock'], 20)
+
+    def test_update_stock_rejects_non_integers(self):
+        """Test de la validation du stock : booléens, décimaux et chaînes refusés"""
+        url = reverse('update-product-stock', kwargs={'product_id': self.product.id})
+        for value in (True, 3.9, '3'):
+            response = self.client.patch(url, {'stock': value}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, value)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+
+    def test_put_only_writes_received_fields(self):
+        """Test d'un PUT : le stock est écrit par compare-and-set"""
+        url = reverse('product-detail', kwargs={'pk': self.product.pk})
+        data = {'name': 'Renamed', 'description': 'D', 'price': '19.99', 'stock': 3}
+        response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stock'], 3)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.name, self.product.stock), ('Renamed', 3))
+        self.assertTrue(OutboxEvent.objects.filter(routing_key='stock.updated').exists())
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class ReserveStockAPITest(APITestCase):
+    def setUp(self):
+        self.product1 = Product.objects.create(name='P1', description='D1', price=Decimal('1.00'), stock=10)
+        self.product2 = Product.objects.create(name='P2', description='D2', price=Decimal('2.00'), stock=3)
+        self.url = reverse('reserve-stock')
+
+    def test_reserve_all_items(self):
+        """Test d'une réservation complète avec regroupement des lignes"""
+        data = {'items': [
+            {'product_id': self.product1.id, 'quantity': 2},
+            {'product_id': self.product2.id, 'quantity': 3},
+            {'product_id': self.product1.id, 'quantity': 1},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.product1.refresh_from_db()
+        self.product2.refresh_from_db()
+        self.assertEqual((self.product1.stock, self.product2.stock), (7, 0))
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.routing_key, 'stock.updated')
+        self.assertEqual(
+            sorted((item['product_id'], item['new_stock']) for item in event.payload['items']),
+            [(self.product1.id, 7), (self.product2.id, 0)]
+        )
+
+    def test_reservation_is_all_or_nothing(self):
+        """Test de l'annulation complète si une ligne ne peut pas être servie"""
+        data = {'items': [
+            {'product_id': self.product1.id, 'quantity': 2},
+            {'product_id': self.product2.id, 'quantity': 4},
+            {'product_id': 999, 'quantity': 1},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['failures'], [
+            {'product_id': self.product2.id, 'reason': 'insufficient_stock'},
+            {'product_id': 999, 'reason': 'not_found'},
+        ])
+        self.product1.refresh_from_db()
+        self.assertEqual(self.product1.stock, 10)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_reserve_validates_items(self):
+        """Test de la validation des lignes"""
+        for data in ({}, {'items': []}, {'items': [{'product_id': self.product1.id, 'quantity': 0}]}):
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reserve_rejects_out_of_range_quantities(self):
+        """Test des quantités hors des bornes de la colonne, par ligne et cumulées par produit"""
+        half = 2 ** 62
+        for items in (
+            [{'product_id': self.product1.id, 'quantity': 10 ** 20}],
+            [{'product_id': self.product1.id, 'quantity': 2 ** 63}],
+            [{'product_id': self.product1.id, 'quantity': half}, {'product_id': self.product1.id, 'quantity': half}],
+        ):
+            response = self.client.post(self.url, {'items': items}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.product1.refresh_from_db()
+        self.assertEqual(self.product1.stock, 10)
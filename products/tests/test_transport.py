@@ -0,0 +1,117 @@
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from products.consumer import ORDER_QUEUE, STOCK_QUEUE
+from products.dedup import reset_deduplicator
+from products.models import Product
+from products.publisher import reset_publisher
+from products.service_product import handle_order_created_batch, handle_stock_updated_batch
+from products.transport import AMQPTransport, InProcessTransport, get_transport, reset_transport
+
+
+@override_settings(EVENT_TRANSPORT='inprocess', EVENT_DISPATCH_MODE='sync')
+class InProcessTransportTest(TestCase):
+    def setUp(self):
+        reset_transport()
+        reset_deduplicator()
+        self.addCleanup(reset_transport)
+        self.transport = get_transport()
+
+    def test_setting_selects_in_process_transport(self):
+        """Test de la sélection du transport par EVENT_TRANSPORT"""
+        self.assertIsInstance(self.transport, InProcessTransport)
+
+    def test_published_dicts_reach_handler_without_serialization(self):
+        """Test de la livraison : le handler reçoit les dicts publiés, par lot"""
+        handler = MagicMock()
+        self.transport.bind('test_queue', 'test.event', handler)
+        messages = [{'n': 1}, {'n': 2}]
+
+        self.transport.publish_batch([('test.event', message) for message in messages])
+        delivered = self.transport.drain('test_queue', handler)
+
+        self.assertEqual(delivered, 2)
+        batch = handler.call_args.args[0]
+        self.assertEqual(batch, messages)
+        self.assertIs(batch[0], messages[0])
+
+    def test_unbound_routing_key_is_dropped(self):
+        """Test d'un événement sans queue liée : ignoré, comme par l'exchange"""
+        handler = MagicMock()
+        self.transport.bind('test_queue', 'test.event', handler)
+
+        self.transport.publish('other.event', {'n': 1})
+
+        self.assertEqual(self.transport.drain('test_queue', handler), 0)
+        handler.assert_not_called()
+
+    def test_failed_batch_is_retried_one_by_one(self):
+        """Test d'un lot en échec : reprise message par message, le message fautif est abandonné"""
+        handled = []
+
+        def handler(messages):
+            if len(messages) > 1 or messages[0]['n'] == 2:
+                raise ValueError('boom')
+            handled.extend(messages)
+
+        self.transport.bind('test_queue', 'test.event', handler)
+        for n in (1, 2, 3):
+            self.transport.publish('test.event', {'n': n})
+        self.transport.drain('test_queue', handler)
+
+        self.assertEqual(handled, [{'n': 1}, {'n': 3}])
+
+    def test_order_round_trip_without_broker(self):
+        """Test de bout en bout sans RabbitMQ : commande appliquée, écho stock.updated livré puis ignoré"""
+        product = Product.objects.create(name='P', description='D', price=Decimal('1.00'), stock=10)
+        self.transport.bind(ORDER_QUEUE, 'order.created', handle_order_created_batch)
+        self.transport.bind(STOCK_QUEUE, 'stock.updated', handle_stock_updated_batch)
+
+        with patch('products.publisher.pika.BlockingConnection') as mock_connection:
+            self.transport.publish('order.created', {
+                'order_id': 1, 'products': [{'product_id': product.id, 'quantity': 3}]
+            })
+            with self.captureOnCommitCallbacks(execute=True):
+                self.transport.drain(ORDER_QUEUE, handle_order_created_batch)
+            echoes = self.transport.drain(STOCK_QUEUE, handle_stock_updated_batch)
+
+        mock_connection.assert_not_called()
+        self.assertEqual(echoes, 1)
+        self.assertEqual(Product.objects.get(id=product.id).stock, 7)
+
+    def test_consume_events_command_is_refused(self):
+        """Test de la commande consume_events : pas de consumer séparé avec le transport en mémoire"""
+        with self.assertRaises(CommandError):
+            call_command('consume_events')
+
+
+class AMQPTransportTest(TestCase):
+    def setUp(self):
+        reset_transport()
+        reset_publisher()
+        self.addCleanup(reset_transport)
+        self.addCleanup(reset_publisher)
+
+    def test_default_transport_is_amqp(self):
+        """Test du transport par défaut"""
+        self.assertIsInstance(get_transport(), AMQPTransport)
+
+    @patch('products.publisher.pika.BlockingConnection')
+    def test_publish_reuses_shared_connection(self, mock_connection):
+        """Test de la publication AMQP : une seule connexion pour plusieurs messages"""
+        transport = get_transport()
+        transport.publish('stock.updated', {'product_id': 1})
+        transport.publish_batch([('stock.updated', {'product_id': 2}), ('stock.updated', {'product_id': 3})])
+
+        mock_connection.assert_called_once()
+        self.assertEqual(mock_connection.return_value.channel.return_value.basic_publish.call_count, 3)
+
+    @override_settings(EVENT_TRANSPORT='kafka')
+    def test_unknown_transport(self):
+        """Test d'un transport inconnu"""
+        with self.assertRaises(ValueError):
+            get_transport()
@@ -0,0 +1,310 @@
+import gzip
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from products.models import OutboxEvent, Product, ProductQuerySet
+from products.pagination import ProductCursorPagination
+from products.serializers import ProductSerializer
+from products.views import ProductRetrieveUpdateDestroy
+
+
+class ProductListPaginationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(5):
+            Product.objects.create(
+                name=f'Product {i}', description=f'Description {i}', price=Decimal('10.00'), stock=i
+            )
+        self.url = reverse('product-list-create')
+
+    def test_list_without_pagination_params(self):
+        """Test de la liste complète sans paramètre de pagination"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_cursor_pagination_walks_all_pages(self):
+        """Test du parcours de toutes les pages avec le curseur"""
+        response = self.client.get(self.url, {'page_size': 2})
+        names = [product['name'] for product in response.data['results']]
+
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            names.extend(product['name'] for product in response.data['results'])
+
+        self.assertEqual(names, [f'Product {i}' for i in range(5)])
+
+    def test_page_size_is_capped(self):
+        """Test du plafond de taille de page"""
+        max_page_size = ProductCursorPagination.max_page_size
+        ProductCursorPagination.max_page_size = 3
+        try:
+            response = self.client.get(self.url, {'page_size': 100})
+        finally:
+            ProductCursorPagination.max_page_size = max_page_size
+
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+
+
+class ProductExportTest(APITestCase):
+    def setUp(self):
+        for i in range(5):
+            Product.objects.create(
+                name=f'Product {i}', description=f'Description {i}', price=Decimal('10.50'), stock=i
+            )
+        self.url = reverse('product-export')
+
+    def expected(self):
+        return ProductSerializer(Product.objects.order_by('id'), many=True).data
+
+    @override_settings(PRODUCT_EXPORT_CHUNK_SIZE=2)
+    def test_export_ndjson(self):
+        """Test de l'export NDJSON, identique au serializer"""
+        response = self.client.get(self.url)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line) for line in lines], self.expected())
+
+    @override_settings(PRODUCT_EXPORT_CHUNK_SIZE=2)
+    def test_export_json_array(self):
+        """Test de l'export en tableau JSON"""
+        response = self.client.get(self.url, {'format': 'json'})
+
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), self.expected())
+
+    def test_export_empty_json_array(self):
+        """Test de l'export d'un catalogue vide"""
+        Product.objects.all().delete()
+        response = self.client.get(self.url, {'format': 'json'})
+
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+    def test_export_gzip(self):
+        """Test de l'export compressé en gzip"""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual([json.loads(line) for line in content.splitlines()], self.expected())
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class ProductBulkUpsertTest(APITestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Existing', description='Existing product', price=Decimal('10.00'), stock=10
+        )
+        self.url = reverse('product-bulk')
+
+    def test_bulk_create_and_update(self):
+        """Test de la création et de la mise à jour groupées"""
+        data = [
+            {'name': 'New 1', 'description': 'D1', 'price': '5.00', 'stock': 1},
+            {'name': 'New 2', 'description': 'D2', 'price': '6.00', 'stock': 2},
+            {'id': self.product.id, 'price': '12.50', 'stock': 4},
+        ]
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['created']), 2)
+        self.assertEqual(len(response.data['updated']), 1)
+        self.assertEqual(Product.objects.count(), 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal('12.50'))
+        self.assertEqual(self.product.stock, 4)
+
+    def test_bulk_publishes_batched_events(self):
+        """Test de la publication d'un seul événement par type"""
+        data = [{'name': f'New {i}', 'description': 'D', 'price': '5.00', 'stock': i} for i in range(3)]
+        data.append({'id': self.product.id, 'stock': 7})
+        self.client.post(self.url, data, format='json')
+
+        events = {event.routing_key: event.payload for event in OutboxEvent.objects.all()}
+        self.assertEqual(OutboxEvent.objects.count(), 3)
+        self.assertEqual(len(events['product.created']['products']), 3)
+        self.assertEqual(len(events['product.updated']['products']), 1)
+        self.assertEqual(events['stock.updated']['items'], [{'product_id': self.product.id, 'new_stock': 7, 'version': 2}])
+
+    def test_bulk_reports_item_errors(self):
+        """Test des erreurs par élément sans annuler le reste du lot"""
+        data = [
+            {'name': 'Valid', 'description': 'D', 'price': '5.00', 'stock': 1},
+            {'name': 'Missing price', 'description': 'D', 'stock': 1},
+            {'id': 999, 'stock': 1},
+            'not a product',
+        ]
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+        self.assertTrue(Product.objects.filter(name='Valid').exists())
+
+    def test_bulk_update_keeps_concurrent_stock_change(self):
+        """Test d'une décrémentation concurrente : le stock non envoyé n'est pas réécrit"""
+        other = Product.objects.create(name='Other', description='D', price=Decimal('1.00'), stock=5)
+        in_bulk = ProductQuerySet.in_bulk
+
+        def read_then_decrement(queryset, *args, **kwargs):
+            rows = in_bulk(queryset, *args, **kwargs)
+            if self.product.id in rows and rows[self.product.id].stock == 10:
+                Product.objects.adjust_stock(self.product.id, -3)
+            return rows
+
+        data = [{'id': self.product.id, 'price': '11.00'}, {'id': other.id, 'stock': 2}]
+        with patch.object(ProductQuerySet, 'in_bulk', read_then_decrement):
+            response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.price, self.product.stock, self.product.version), (Decimal('11.00'), 7, 3))
+        other.refresh_from_db()
+        self.assertEqual((other.stock, other.version), (2, 2))
+
+    def test_bulk_rejects_non_list(self):
+        """Test d'un corps qui n'est pas une liste"""
+        response = self.client.post(self.url, {'name': 'x'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EVENT_DISPATCH_MODE='outbox')
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            name='Product', description='Description', price=Decimal('10.00'), stock=5
+        )
+        self.detail_url = reverse('product-detail', kwargs={'pk': self.product.id})
+        self.list_url = reverse('product-list-create')
+
+    def test_detail_not_modified(self):
+        """Test d'un If-None-Match à jour sur le détail : 304 sans corps"""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['ETag'], f'"{self.product.id}-1"')
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_stock_change_invalidates_detail_etag(self):
+        """Test d'une variation de stock : nouvelle version, nouvel ETag"""
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.post(
+            reverse('increment-product-stock', kwargs={'product_id': self.product.id}),
+            {'quantity': 1}, format='json'
+        )
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_not_modified_then_changed(self):
+        """Test de l'ETag de la liste : 304 tant que rien ne change, y compris après une suppression"""
+        Product.objects.create(name='Other', description='D', price=Decimal('1.00'), stock=1)
+        etag = self.client.get(self.list_url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.delete(self.detail_url)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_update_after_concurrent_write_gets_new_version(self):
+        """Test d'un PATCH lu avant une décrémentation concurrente : jamais la même version pour deux états"""
+        get_object = ProductRetrieveUpdateDestroy.get_object
+
+        def get_then_decrement(view):
+            product = get_object(view)
+            Product.objects.adjust_stock(product.id, -1)
+            return product
+
+        with patch.object(ProductRetrieveUpdateDestroy, 'get_object', get_then_decrement):
+            self.client.patch(self.detail_url, {'name': 'Renamed'}, format='json')
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.name, self.product.stock, self.product.version), ('Renamed', 4, 3))
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=f'"{self.product.id}-2"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Renamed')
+
+    def test_bulk_update_bumps_version_and_updated_at(self):
+        """Test des écritures en masse : version et updated_at mis à jour"""
+        before = self.product.updated_at
+        self.client.post(reverse('product-bulk'), [{'id': self.product.id, 'stock': 9}], format='json')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.version, 2)
+        self.assertGreater(self.product.updated_at, before)
+
+
+class LowStockProductsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # Plusieurs produits au même stock : le curseur doit départager par id
+        for stock in (5, 0, 3, 3, 3, 12, 1):
+            Product.objects.create(name=f'Stock {stock}', description='D', price=Decimal('1.00'), stock=stock)
+        self.url = reverse('low-stock-products')
+
+    def test_low_stock_sorted_with_database_count(self):
+        """Test du tri par stock et du COUNT SQL"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data['threshold'], 10)
+        self.assertEqual(response.data['count'], 6)
+        self.assertEqual([p['stock'] for p in response.data['products']], [0, 1, 3, 3, 3, 5])
+        self.assertIsNone(response.data['next'])
+        self.assertTrue(any('COUNT(' in query['sql'] for query in queries))
+
+    def test_keyset_pages_across_ties(self):
+        """Test de la pagination keyset sur (stock, id) avec des stocks égaux"""
+        seen = []
+        url = f'{self.url}?threshold=10&page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend((p['stock'], p['id']) for p in response.data['products'])
+            url = response.data['next']
+
+        self.assertEqual(seen, sorted(Product.objects.filter(stock__lt=10).values_list('stock', 'id')))
+
+    def test_invalid_threshold(self):
+        """Test d'un seuil non entier ou négatif"""
+        for threshold in ('abc', '-1', '2.5'):
+            response = self.client.get(self.url, {'threshold': threshold})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_cursor(self):
+        """Test d'un curseur corrompu"""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_query_uses_stock_index(self):
+        """Test du plan de requête : index (stock, id), sans tri temporaire"""
+        queryset = Product.objects.filter(stock__lt=10).order_by('stock', 'id')
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {queryset.query}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+
+        self.assertIn('product_stock_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
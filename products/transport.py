@@ -0,0 +1,162 @@
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .consumer import BatchingConsumer, run_handler
+from .publisher import get_publisher
+
+TRANSPORT_AMQP = 'amqp'
+TRANSPORT_INPROCESS = 'inprocess'
+
+
+class AMQPTransport:
+    """Transport RabbitMQ : publisher persistant partagé et consumer par lots à ack manuel"""
+
+    name = TRANSPORT_AMQP
+
+    def publish(self, routing_key, message):
+        get_publisher().publish(routing_key, message)
+
+    def publish_batch(self, messages):
+        get_publisher().publish_batch(messages)
+
+    def consume(self, bindings, prefetch_count=None, batch_size=None):
+        """Consomme indéfiniment ; ``bindings`` est une liste de (queue, routing_key, handler)"""
+        consumer = BatchingConsumer(prefetch_count=prefetch_count, batch_size=batch_size)
+        for queue_name, routing_key, handler in bindings:
+            consumer.bind(queue_name, routing_key, handler)
+        consumer.run()
+
+
+class InProcessTransport:
+    """Transport en mémoire : les événements publiés sont livrés aux handlers du même processus.
+
+    Les messages restent des dicts (ni JSON ni broker) et sont traités par lots comme
+    avec ``BatchingConsumer`` : ``batch_size`` messages ou ``batch_window`` secondes
+    d'attente, puis un nouvel essai message par message si le lot échoue.
+    Comme un exchange sans queue liée, un événement publié avant ``consume()`` ou
+    sans binding pour sa routing key (correspondance exacte) est ignoré. Il n'y a
+    ni persistance ni redélivraison : un message qui échoue seul est abandonné.
+    """
+
+    name = TRANSPORT_INPROCESS
+
+    def __init__(self, batch_size=None, batch_window=None):
+        self.batch_size = batch_size or settings.EVENT_CONSUMER_BATCH_SIZE
+        self.batch_window = batch_window if batch_window is not None else settings.EVENT_CONSUMER_BATCH_WINDOW
+        self._queues = {}
+        self._bindings = {}
+        self._lock = threading.Lock()
+
+    def publish(self, routing_key, message):
+        with self._lock:
+            bound = list(self._bindings.get(routing_key, ()))
+        for queue_name, _ in bound:
+            self._queues[queue_name].put((routing_key, message))
+
+    def publish_batch(self, messages):
+        for routing_key, message in messages:
+            self.publish(routing_key, message)
+
+    def bind(self, queue_name, routing_key, handler):
+        """Déclare la queue et la lie à la routing key (sans consommer)"""
+        with self._lock:
+            self._queues.setdefault(queue_name, queue.Queue())
+            self._bindings.setdefault(routing_key, []).append((queue_name, handler))
+
+    def _next_batch(self, queue_name, timeout):
+        """Attend au plus ``timeout`` le premier message puis complète le lot pendant la fenêtre"""
+        pending = self._queues[queue_name]
+        try:
+            batch = [pending.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(pending.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def drain(self, queue_name, handler):
+        """Traite tout ce qui attend sur la queue ; renvoie le nombre de messages livrés"""
+        delivered = 0
+        while True:
+            batch = self._next_batch(queue_name, timeout=0)
+            if not batch:
+                return delivered
+            self._deliver(queue_name, handler, batch)
+            delivered += len(batch)
+
+    def _deliver(self, queue_name, handler, batch):
+        close_old_connections()
+        routing_key = batch[0][0]
+        messages = [message for _, message in batch]
+        try:
+            run_handler(handler, messages, queue_name, routing_key)
+        except Exception as e:
+            print(f"❌ Batch of {len(messages)} messages failed on {queue_name}, retrying one by one: {e}")
+            for message in messages:
+                try:
+                    run_handler(handler, [message], queue_name, routing_key)
+                except Exception as e:
+                    print(f"❌ Message failed on {queue_name}, discarded: {e}")
+
+    def _consume_queue(self, queue_name, handler):
+        while True:
+            batch = self._next_batch(queue_name, timeout=1.0)
+            if batch:
+                self._deliver(queue_name, handler, batch)
+
+    def consume(self, bindings, prefetch_count=None, batch_size=None):
+        """Lie les queues puis les consomme indéfiniment, une queue par thread"""
+        if batch_size:
+            self.batch_size = batch_size
+        for queue_name, routing_key, handler in bindings:
+            self.bind(queue_name, routing_key, handler)
+
+        threads = [
+            threading.Thread(target=self._consume_queue, args=(queue_name, handler), daemon=True,
+                             name=f'inprocess-{queue_name}')
+            for queue_name, _, handler in bindings
+        ]
+        for thread in threads:
+            thread.start()
+        print("👂 Product service écoute les événements (transport en mémoire)...")
+        for thread in threads:
+            thread.join()
+
+
+TRANSPORTS = {
+    TRANSPORT_AMQP: AMQPTransport,
+    TRANSPORT_INPROCESS: InProcessTransport,
+}
+
+_transport = None
+_transport_pid = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Retourne le transport d'événements du processus courant (setting EVENT_TRANSPORT)"""
+    global _transport, _transport_pid
+    if _transport is None or _transport_pid != os.getpid():
+        with _transport_lock:
+            if _transport is None or _transport_pid != os.getpid():
+                if settings.EVENT_TRANSPORT not in TRANSPORTS:
+                    raise ValueError(f"Transport d'événements inconnu : {settings.EVENT_TRANSPORT}")
+                _transport = TRANSPORTS[settings.EVENT_TRANSPORT]()
+                _transport_pid = os.getpid()
+    return _transport
+
+
+def reset_transport():
+    """Oublie le transport du processus (tests, changement de configuration)"""
+    global _transport
+    with _transport_lock:
+        _transport = None
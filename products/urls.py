@@ -1,16 +1,24 @@
 from django.urls import path
 from .views import (
     ProductListCreate, ProductRetrieveUpdateDestroy,
-    get_product_stock, update_product_stock, get_low_stock_products
+    get_product_stock, update_product_stock, get_low_stock_products,
+    export_products, bulk_upsert_products, search_products,
+    increment_product_stock, decrement_product_stock, reserve_stock
 )
 
 urlpatterns = [
     # Routes CRUD standard
     path('products/', ProductListCreate.as_view(), name='product-list-create'),
     path('products/<int:pk>/', ProductRetrieveUpdateDestroy.as_view(), name='product-detail'),
+    path('products/export/', export_products, name='product-export'),
+    path('products/bulk/', bulk_upsert_products, name='product-bulk'),
+    path('products/search/', search_products, name='product-search'),
     
     # Routes pour la gestion des stocks
     path('products/<int:product_id>/stock/', get_product_stock, name='product-stock'),
     path('products/<int:product_id>/stock/update/', update_product_stock, name='update-product-stock'),
+    path('products/<int:product_id>/stock/increment/', increment_product_stock, name='increment-product-stock'),
+    path('products/<int:product_id>/stock/decrement/', decrement_product_stock, name='decrement-product-stock'),
+    path('products/stock/reserve/', reserve_stock, name='reserve-stock'),
     path('products/low-stock/', get_low_stock_products, name='low-stock-products'),
 ]
@@ -1,19 +1,113 @@
+import hashlib
+import json
+import zlib
+from itertools import islice
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views.decorators.http import condition, require_GET
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
-from .models import Product
-from .serializers import ProductSerializer
-from .service_product import publish_product_created, publish_product_updated, publish_stock_updated
+from .cache import (
+    DETAIL, STOCK, VALIDATORS, cache_catalog_response, cached_catalog_response, cached_catalog_value,
+    cached_lookup, invalidate_products
+)
+from .filters import filter_products, get_ordering
+from .models import InsufficientStock, Product, StockConflict, StockReservationFailed
+from .pagination import ProductCursorPagination, ProductSearchPagination, StockKeysetPagination
+from .search import find_products, search_terms
+from .serializers import ProductSerializer, product_fields, serialize_product_rows
+from .service_product import (
+    publish_product_created, publish_product_updated, publish_stock_updated,
+    publish_products_batch, publish_stock_updated_batch
+)
+
+
+def _catalog_state(request):
+    """Agrégat qui change à chaque création, modification ou suppression (une requête par appel)"""
+    if not hasattr(request, '_catalog_state'):
+        request._catalog_state = Product.objects.aggregate(
+            count=Count('id'), max_id=Max('id'), versions=Sum('version'), updated_at=Max('updated_at')
+        )
+    return request._catalog_state
+
+
+def _catalog_etag(request, *args, **kwargs):
+    def load():
+        state = _catalog_state(request)
+        # Le format de rendu (JSON, API navigable...) dépend de l'en-tête Accept
+        key = f"{state['count']}:{state['max_id']}:{state['versions']}:{state['updated_at']}:{request.META.get('HTTP_ACCEPT', '')}"
+        return hashlib.md5(key.encode('utf-8')).hexdigest()
+    # Recalculé seulement quand la version du catalogue change
+    return cached_catalog_value('etag', request, load)
+
+
+def _product_validators(request, pk):
+    """(version, updated_at) d'un produit, sans le sérialiser"""
+    if not hasattr(request, '_product_validators'):
+        request._product_validators = cached_lookup(
+            VALIDATORS, pk, lambda: Product.objects.filter(pk=pk).values_list('version', 'updated_at').first()
+        )
+    return request._product_validators
+
+
+def _product_etag(request, pk):
+    validators = _product_validators(request, pk)
+    return f"{pk}-{validators[0]}" if validators else None
+
+
+def _product_last_modified(request, pk):
+    validators = _product_validators(request, pk)
+    return validators[1] if validators else None
 
 
 class ProductListCreate(generics.ListCreateAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
+    pagination_class = ProductCursorPagination
+
+    def get_ordering(self):
+        return get_ordering(self.request.query_params)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        return filter_products(queryset, self.request.query_params, self.get_ordering())
+
+    def list(self, request, *args, **kwargs):
+        # Lecture rapide : lignes values() sérialisées sans instancier de modèle
+        queryset = self.filter_queryset(self.get_queryset()).values(*product_fields())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_product_rows(page))
+        return Response(serialize_product_rows(queryset))
+
+    @method_decorator(condition(etag_func=_catalog_etag))
+    def get(self, request, *args, **kwargs):
+        response = cached_catalog_response(request)
+        if response is not None:
+            return response
+
+        response = super().get(request, *args, **kwargs)
+        # Informatif seulement : une suppression ne fait pas reculer max(updated_at),
+        # la validation (304) repose donc sur l'ETag
+        updated_at = _catalog_state(request)['updated_at']
+        if updated_at is not None:
+            response['Last-Modified'] = http_date(updated_at.timestamp())
+        return cache_catalog_response(request, response)
 
+    @transaction.atomic
     def perform_create(self, serializer):
         product = serializer.save()
+        invalidate_products([product.id])
         # Publication de l'événement de création
         product_data = ProductSerializer(product).data
         publish_product_created(product_data)
@@ -25,9 +119,25 @@ class ProductRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
 
+    @method_decorator(condition(etag_func=_product_etag, last_modified_func=_product_last_modified))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        data = cached_lookup(DETAIL, self.kwargs['pk'], lambda: dict(self.get_serializer(self.get_object()).data))
+        return Response(data)
+
+    @transaction.atomic
     def perform_update(self, serializer):
-        old_stock = serializer.instance.stock if serializer.instance else 0
+        # Le stock est écrit à part, par compare-and-set, pour connaître l'ancienne valeur réelle
+        new_stock = serializer.validated_data.pop('stock', None)
         product = serializer.save()
+        invalidate_products([product.id])
+        old_stock = product.stock
+        if new_stock is not None:
+            old_stock, level = Product.objects.set_stock(product.id, new_stock)
+            invalidate_products([product.id])
+            product.stock, product.version = level
         
         # Publication de l'événement de mise à jour
         product_data = ProductSerializer(product).data
@@ -35,13 +145,14 @@ class ProductRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
         
         # Si le stock a changé, publier un événement spécifique
         if old_stock != product.stock:
-            publish_stock_updated(product.id, product.stock)
+            publish_stock_updated(product.id, product.stock, product.version)
             print(f"✅ Stock mis à jour pour {product.name}: {old_stock} → {product.stock}")
         
         print(f"✅ Produit mis à jour et événement publié: {product.name}")
 
     def perform_destroy(self, instance):
         product_name = instance.name
+        invalidate_products([instance.id])
         instance.delete()
         print(f"✅ Produit supprimé: {product_name}")
 
@@ -50,18 +161,23 @@ class ProductRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
 @permission_classes([AllowAny])
 def get_product_stock(request, product_id):
     """Récupère le stock d'un produit spécifique"""
-    try:
-        product = Product.objects.get(id=product_id)
-        return Response({
-            'product_id': product.id,
-            'name': product.name,
-            'stock': product.stock,
-            'available': product.stock > 0
-        }, status=status.HTTP_200_OK)
-    except Product.DoesNotExist:
+    def load():
+        product = Product.objects.filter(id=product_id).values('id', 'name', 'stock').first()
+        if product is None:
+            return None
+        return {
+            'product_id': product['id'],
+            'name': product['name'],
+            'stock': product['stock'],
+            'available': product['stock'] > 0
+        }
+
+    data = cached_lookup(STOCK, product_id, load)
+    if data is None:
         return Response({
             'message': f'Produit {product_id} non trouvé'
         }, status=status.HTTP_404_NOT_FOUND)
+    return Response(data, status=status.HTTP_200_OK)
 
 
 @api_view(['PATCH'])
@@ -77,17 +193,22 @@ def update_product_stock(request, product_id):
                 'message': 'Le champ stock est requis'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        if isinstance(new_stock, bool) or not isinstance(new_stock, int):
+            return Response({
+                'message': 'Le stock doit être un entier'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         if new_stock < 0:
             return Response({
                 'message': 'Le stock ne peut pas être négatif'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        old_stock = product.stock
-        product.stock = new_stock
-        product.save()
-        
-        # Publication de l'événement de mise à jour de stock
-        publish_stock_updated(product.id, new_stock)
+        with transaction.atomic():
+            old_stock, level = Product.objects.set_stock(product.id, new_stock)
+            invalidate_products([product.id])
+
+            # Publication de l'événement de mise à jour de stock
+            publish_stock_updated(product.id, level.stock, level.version)
         
         return Response({
             'message': 'Stock mis à jour avec succès',
@@ -101,24 +222,323 @@ def update_product_stock(request, product_id):
         return Response({
             'message': f'Produit {product_id} non trouvé'
         }, status=status.HTTP_404_NOT_FOUND)
+    except StockConflict as e:
+        return Response({
+            'message': str(e)
+        }, status=status.HTTP_409_CONFLICT)
+
+
+def _max_quantity():
+    """Plus grande quantité acceptée : la borne d'une colonne IntegerField de la base"""
+    return connection.ops.integer_field_range('IntegerField')[1]
+
+
+def _is_quantity(value):
+    """Entier strictement positif qui tient dans la colonne stock"""
+    return not isinstance(value, bool) and isinstance(value, int) and 0 < value <= _max_quantity()
+
+
+def _adjust_stock(request, product_id, sign):
+    """Applique une variation de stock atomique (sign = 1 ou -1) et publie le nouveau stock"""
+    quantity = request.data.get('quantity')
+    if not _is_quantity(quantity):
+        return Response({
+            'message': f'Le champ quantity doit être un entier strictement positif (au plus {_max_quantity()})'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with transaction.atomic():
+            level = Product.objects.adjust_stock(product_id, sign * quantity)
+            invalidate_products([product_id])
+            publish_stock_updated(product_id, level.stock, level.version)
+    except Product.DoesNotExist:
+        return Response({
+            'message': f'Produit {product_id} non trouvé'
+        }, status=status.HTTP_404_NOT_FOUND)
+    except InsufficientStock as e:
+        return Response({
+            'message': str(e)
+        }, status=status.HTTP_409_CONFLICT)
+
+    return Response({
+        'message': 'Stock mis à jour avec succès',
+        'product_id': product_id,
+        'quantity': sign * quantity,
+        'new_stock': level.stock
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def increment_product_stock(request, product_id):
+    """Augmente le stock d'un produit de ``quantity``"""
+    return _adjust_stock(request, product_id, 1)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def decrement_product_stock(request, product_id):
+    """Diminue le stock d'un produit de ``quantity`` sans jamais passer sous zéro"""
+    return _adjust_stock(request, product_id, -1)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def reserve_stock(request):
+    """Réserve le stock de toutes les lignes d'une commande en une transaction (tout ou rien)"""
+    items = request.data.get('items') if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response({
+            'message': 'Le champ items (liste de {product_id, quantity}) est requis'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(items) > settings.PRODUCT_BULK_MAX_ITEMS:
+        return Response({
+            'message': f'Au plus {settings.PRODUCT_BULK_MAX_ITEMS} lignes par réservation'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Les lignes d'un même produit sont regroupées
+    quantities = {}
+    for item in items:
+        product_id = item.get('product_id') if isinstance(item, dict) else None
+        quantity = item.get('quantity') if isinstance(item, dict) else None
+        if isinstance(product_id, bool) or not isinstance(product_id, int) or not _is_quantity(quantity):
+            return Response({
+                'message': 'Chaque ligne doit contenir un product_id entier et une quantity strictement positive',
+                'item': item
+            }, status=status.HTTP_400_BAD_REQUEST)
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+        # La somme des lignes d'un produit doit aussi tenir dans la colonne stock
+        if quantities[product_id] > _max_quantity():
+            return Response({
+                'message': f'Quantité totale trop grande pour le produit {product_id} (au plus {_max_quantity()})',
+                'item': item
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with transaction.atomic():
+            levels = Product.objects.reserve_stock(quantities)
+            invalidate_products(levels)
+            publish_stock_updated_batch([
+                (product_id, level.stock, level.version) for product_id, level in levels.items()
+            ])
+    except StockReservationFailed as e:
+        return Response({
+            'message': str(e),
+            'failures': e.failures
+        }, status=status.HTTP_409_CONFLICT)
+
+    return Response({
+        'message': 'Stock réservé avec succès',
+        'reserved': [
+            {'product_id': product_id, 'quantity': quantities[product_id], 'new_stock': level.stock}
+            for product_id, level in levels.items()
+        ]
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_low_stock_products(request):
-    """Récupère les produits avec un stock faible (moins de 10 unités)"""
+    """Récupère les produits avec un stock faible (moins de 10 unités), triés par stock et paginés"""
     try:
-        threshold = request.query_params.get('threshold', 10)
-        low_stock_products = Product.objects.filter(stock__lt=threshold)
-        serializer = ProductSerializer(low_stock_products, many=True)
-        
+        threshold = int(request.query_params.get('threshold', 10))
+    except ValueError:
+        threshold = -1
+    if threshold < 0:
         return Response({
-            'threshold': threshold,
-            'count': len(low_stock_products),
-            'products': serializer.data
-        }, status=status.HTTP_200_OK)
-        
-    except Exception as e:
+            'message': 'Le paramètre threshold doit être un entier positif'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    response = cached_catalog_response(request)
+    if response is not None:
+        return response
+
+    low_stock_products = Product.objects.filter(stock__lt=threshold)
+    paginator = StockKeysetPagination()
+    page = paginator.paginate_queryset(low_stock_products.values(*product_fields()), request)
+
+    return cache_catalog_response(request, Response({
+        'threshold': threshold,
+        'count': low_stock_products.count(),
+        'next': paginator.get_next_link(),
+        'products': serialize_product_rows(page)
+    }, status=status.HTTP_200_OK))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_products(request):
+    """Recherche plein texte dans le nom et la description, résultats classés et paginés"""
+    query = request.query_params.get('q', '')
+    if not search_terms(query):
+        return Response({
+            'message': 'Le paramètre q est requis'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = ProductSearchPagination()
+    page = paginator.paginate_queryset(find_products(query), request)
+    serializer = ProductSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+def _bulk_upsert(items):
+    """Valide et écrit les éléments de bulk_upsert_products ; à appeler dans une transaction"""
+    existing = Product.objects.in_bulk([
+        item['id'] for item in items if isinstance(item, dict) and isinstance(item.get('id'), int)
+    ])
+    to_create, changes, errors = [], {}, []
+
+    # Validation élément par élément : un produit invalide n'empêche pas les autres
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': ['Un objet produit est attendu']}})
+            continue
+
+        product_id = item.get('id')
+        if product_id is None:
+            serializer = ProductSerializer(data=item)
+        elif product_id in existing:
+            serializer = ProductSerializer(existing[product_id], data=item, partial=True)
+        else:
+            errors.append({'index': index, 'errors': {'id': [f'Produit {product_id} non trouvé']}})
+            continue
+
+        if not serializer.is_valid():
+            errors.append({'index': index, 'errors': serializer.errors})
+            continue
+
+        if serializer.instance is None:
+            to_create.append(Product(**serializer.validated_data))
+        else:
+            changes.setdefault(product_id, {}).update(serializer.validated_data)
+
+    created = Product.objects.bulk_create(to_create, batch_size=500)
+    invalidate_products(product.id for product in created)
+
+    # Chaque produit n'écrit que les champs envoyés (un bulk_update par combinaison de champs),
+    # avec une version incrémentée en SQL : une écriture concurrente n'est ni écrasée ni masquée
+    now = timezone.now()
+    groups = {}
+    for product_id, data in changes.items():
+        fields = tuple(sorted(set(data) - {'stock'}))
+        if fields:
+            product = existing[product_id]
+            for field in fields:
+                setattr(product, field, data[field])
+            product.version = F('version') + 1
+            product.updated_at = now
+            groups.setdefault(fields, []).append(product)
+    for fields, products in groups.items():
+        Product.objects.bulk_update(products, fields=[*fields, 'version', 'updated_at'], batch_size=500)
+
+    # Le stock passe par compare-and-set, comme PATCH /stock/update/
+    stock_changes = []
+    for product_id, data in changes.items():
+        if 'stock' in data:
+            old_stock, level = Product.objects.set_stock(product_id, data['stock'])
+            if old_stock != level.stock:
+                stock_changes.append((product_id, level.stock, level.version))
+    invalidate_products(changes)
+
+    updated = Product.objects.in_bulk(list(changes))
+    created_data = ProductSerializer(created, many=True).data
+    updated_data = ProductSerializer([updated[product_id] for product_id in changes], many=True).data
+
+    # Un événement groupé (découpé en lots) au lieu d'un message par produit
+    if created_data:
+        publish_products_batch('product.created', created_data)
+    if updated_data:
+        publish_products_batch('product.updated', updated_data)
+    if stock_changes:
+        publish_stock_updated_batch(stock_changes)
+    return created_data, updated_data, errors
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def bulk_upsert_products(request):
+    """Crée (sans id) ou met à jour (avec id) une liste de produits en une seule transaction"""
+    items = request.data
+    if not isinstance(items, list):
+        return Response({
+            'message': 'Une liste de produits est attendue'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(items) > settings.PRODUCT_BULK_MAX_ITEMS:
+        return Response({
+            'message': f'Au plus {settings.PRODUCT_BULK_MAX_ITEMS} produits par requête'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with transaction.atomic():
+            created_data, updated_data, errors = _bulk_upsert(items)
+    except StockConflict as e:
         return Response({
-            'message': f'Erreur lors de la récupération des produits: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'message': str(e)
+        }, status=status.HTTP_409_CONFLICT)
+
+    if errors and not created_data and not updated_data:
+        response_status = status.HTTP_400_BAD_REQUEST
+    elif errors:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_200_OK
+
+    return Response({
+        'created': created_data,
+        'updated': updated_data,
+        'errors': errors
+    }, status=response_status)
+
+
+def _join_rows(rows, as_array):
+    return ','.join(rows) if as_array else ''.join(row + '\n' for row in rows)
+
+
+def _export_chunks(as_array):
+    """Produit le catalogue par blocs de lignes, sans le charger en mémoire"""
+    chunk_size = settings.PRODUCT_EXPORT_CHUNK_SIZE
+    rows = Product.objects.order_by('id').values(*product_fields()).iterator(chunk_size=chunk_size)
+    if as_array:
+        yield '['
+
+    separator = ''
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield separator + _join_rows([json.dumps(row) for row in serialize_product_rows(chunk)], as_array)
+        separator = ',' if as_array else ''
+
+    if as_array:
+        yield ']'
+
+
+def _gzip_chunks(chunks):
+    """Compresse un flux de blocs au fil de l'eau"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@require_GET
+def export_products(request):
+    """Exporte tout le catalogue en NDJSON (ou en tableau JSON avec ?format=json), en streaming"""
+    as_array = request.GET.get('format') == 'json'
+    chunks = _export_chunks(as_array)
+    gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if gzipped:
+        chunks = _gzip_chunks(chunks)
+
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='application/json' if as_array else 'application/x-ndjson'
+    )
+    response['Vary'] = 'Accept-Encoding'
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    return response